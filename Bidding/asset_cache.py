@@ -0,0 +1,49 @@
+# Importing required packages
+import os
+from collections import OrderedDict
+from PIL import Image
+import shared_modules  # Puts the Catalogue's text and instrumentation modules on sys.path
+from instrumentation import metrics
+
+# === Bounded LRU cache of decoded item images ===
+# Entries are keyed by (path, mtime, size) so an edited file on disk is decoded again,
+# and each entry keeps the resized RGBA image together with its alpha mask.
+class AssetCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get_image(self, path, size):
+        key = (path, os.path.getmtime(path), tuple(size))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        with metrics.stage("decode"):
+            img = Image.open(path)
+            img.load()
+        with metrics.stage("resize"):
+            img = img.resize(tuple(size)).convert("RGBA")
+        entry = (img, img.split()[3])
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
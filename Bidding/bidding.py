@@ -1,24 +1,35 @@
 # Importing required packages
 import numpy as np
 import cv2
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+import argparse
 import os
+import shared_modules  # Puts the Catalogue's text and instrumentation modules on sys.path
+from text_render import get_font, wrap_text
+from instrumentation import add_instrumentation_arguments, metrics, run_instrumented
+from asset_cache import AssetCache
+from layered_renderer import LayeredRenderer
+from frame_memo import SpriteAnimation, FrameMemo
 
 # Configuration
 WIDTH, HEIGHT = 1280, 720
 FPS = 30
 ITEM_DISPLAY_DURATION = 3
 FRAMES_PER_ITEM = FPS * ITEM_DISPLAY_DURATION
+ITEM_IMG_SIZE = (400, 400)
+ASSET_CACHE_SIZE = 64  # Max decoded item images kept in memory
 
 # Set the output video file
 output_video = "bidding_simulation_5.mp4"
 
-# Load the resources
-human_img = Image.open(r"C:\Users\Webbies\Jupyter_Notebooks\VideoCreation_From_Image\biddingimages\RemoveBg_Person_Hammer_Gavel.png").resize((400, 600)).convert("RGBA")
-hammer_down_img = Image.open(r"C:\Users\Webbies\Jupyter_Notebooks\VideoCreation_From_Image\biddingimages\RemoveBg_Person_Hammer_Gavel_Touching.png").resize((400, 600)).convert("RGBA")
+# Resources (loaded by load_resources() before rendering)
+human_img_path = r"C:\Users\Webbies\Jupyter_Notebooks\VideoCreation_From_Image\biddingimages\RemoveBg_Person_Hammer_Gavel.png"
+hammer_down_img_path = r"C:\Users\Webbies\Jupyter_Notebooks\VideoCreation_From_Image\biddingimages\RemoveBg_Person_Hammer_Gavel_Touching.png"
 font_path = r"C:/Windows/Fonts/arial.ttf"
-font_title = ImageFont.truetype(font_path, 30)
-font_small = ImageFont.truetype(font_path, 24)
+GAVEL_SIZE = (400, 600)
+
+# Decoded item images, reused across all frames of a lot
+item_cache = AssetCache(max_entries=ASSET_CACHE_SIZE)
 
 # Demo data
 demo_data = [
@@ -42,74 +53,138 @@ demo_data = [
     },
 ]
 
-# Helper: Draw text with wrapping
+# Helper: Draw text with wrapping (word widths are cached, so wrapping is linear)
 def draw_wrapped_text(draw, text, position, font, max_width, fill=(0, 0, 0)):
-    lines = []
-    words = text.split()
-    while words:
-        line_words = []
-        while words:
-            next_line = " ".join(line_words + [words[0]])
-            text_width = font.getbbox(next_line)[2] - font.getbbox(next_line)[0]
-            if text_width <= max_width:
-                line_words.append(words.pop(0))
-            else:
-                break
-        lines.append(" ".join(line_words))
-
     x, y = position
-    for line in lines:
+    for line in wrap_text(text, font, max_width):
         draw.text((x, y), line, font=font, fill=fill)
-        text_height = font.getbbox(line)[3] - font.getbbox(line)[1]
-        y += text_height + 5
-
-# Function to generate the frame
-def create_frame(item_data, frame_count):
-    canvas = Image.new("RGBA", (WIDTH, HEIGHT), color=(255, 255, 255, 255))
+        bbox = font.getbbox(line)
+        y += bbox[3] - bbox[1] + 5
+
+# Position of the animated human with hammer (bottom-left corner)
+GAVEL_POS = (20, HEIGHT - GAVEL_SIZE[1] - 20)
+ITEM_POS = (350, 100)
+
+# Gavel cycle: hammer down for the first 1/5 of every 20 frames, raised otherwise
+GAVEL_CYCLE_LENGTH = 20  # Total frames for one up+down motion
+
+# Load the sprites and fonts
+def load_resources():
+    global human_img, hammer_down_img, font_title, font_small, gavel_animation
+    human_img = Image.open(human_img_path).resize(GAVEL_SIZE).convert("RGBA")
+    hammer_down_img = Image.open(hammer_down_img_path).resize(GAVEL_SIZE).convert("RGBA")
+    font_title = get_font(font_path, 30)
+    font_small = get_font(font_path, 24)
+    gavel_animation = SpriteAnimation([
+        (hammer_down_img, GAVEL_CYCLE_LENGTH // 5),
+        (human_img, GAVEL_CYCLE_LENGTH - GAVEL_CYCLE_LENGTH // 5),
+    ])
+
+# Helper: Pick the gavel sprite for a frame (bidding animation)
+def gavel_sprite(frame_count):
+    return gavel_animation.sprite_at(frame_count)
+
+# Panels a bid changes; each draws only inside its box, so it can be redrawn on its own
+PRICE_BOX = [(770, 320), (1220, 380)]
+BIDDER_BOX = [(770, 400), (1220, 460)]
+
+def draw_price_panel(draw, price):
+    draw.rectangle(PRICE_BOX, fill="#E6FFE6", outline="green", width=2)
+    draw.text((780, 335), f"Current Price: {price}", font=font_title, fill=(0, 128, 0))
+
+def draw_bidder_panel(draw, bidder):
+    draw.rectangle(BIDDER_BOX, fill="#FFF0F5", outline="purple", width=2)
+    draw.text((780, 415), f"Highest Bidder: {bidder}", font=font_title, fill=(128, 0, 128))
+
+# Helper: Draw everything of a lot that does not change between frames.
+# item_image is the (image, alpha) pair of the item if it has already been loaded.
+def draw_lot_content(canvas, item_data, item_image=None):
     draw = ImageDraw.Draw(canvas)
 
-    # 1. Animated human with hammer (bidding animation)
-    cycle_length = 20  # Total frames for one up+down motion
-    in_strike_phase = (frame_count % cycle_length) < (cycle_length // 5)
-
-    human_x = 20
-    human_y = HEIGHT - human_img.height - 20
-
-    if in_strike_phase:
-        canvas.paste(hammer_down_img, (human_x, human_y), hammer_down_img)
-    else:
-        canvas.paste(human_img, (human_x, human_y), human_img)
-
     # 2. Item image (with alpha support)
-    item_img = Image.open(item_data["item_img"]).resize((400, 400)).convert("RGBA")
-    r, g, b, a = item_img.split()
-    canvas.paste(item_img, (350, 100), a)
+    if item_image is None:
+        item_image = item_cache.get_image(item_data["item_img"], ITEM_IMG_SIZE)
+    item_img, item_alpha = item_image
+    canvas.paste(item_img, ITEM_POS, item_alpha)
 
     # 3. Description
     draw.rectangle([(770, 100), (1220, 180)], outline="black", width=3)
     draw_wrapped_text(draw, item_data["description"], (780, 110), font=font_small, max_width=420)
 
     # 4. Current price
-    draw.rectangle([(770, 320), (1220, 380)], fill="#E6FFE6", outline="green", width=2)
-    draw.text((780, 335), f"Current Price: {item_data['price']}", font=font_title, fill=(0, 128, 0))
+    draw_price_panel(draw, item_data["price"])
 
     # 5. Highest bidder
-    draw.rectangle([(770, 400), (1220, 460)], fill="#FFF0F5", outline="purple", width=2)
-    draw.text((780, 415), f"Highest Bidder: {item_data['bidder']}", font=font_title, fill=(128, 0, 128))
+    draw_bidder_panel(draw, item_data["bidder"])
 
-    # Convert to RGB before saving to video (OpenCV doesn't support alpha)
-    return np.array(canvas.convert("RGB"))
+# Function to generate the frame (full redraw)
+def create_frame(item_data, frame_count):
+    canvas = Image.new("RGBA", (WIDTH, HEIGHT), color=(255, 255, 255, 255))
 
-# Create the Video writer object
-fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-video = cv2.VideoWriter(output_video, fourcc, FPS, (WIDTH, HEIGHT))
+    # 1. Animated human with hammer (bidding animation)
+    sprite = gavel_sprite(frame_count)
+    canvas.paste(sprite, GAVEL_POS, sprite)
+
+    draw_lot_content(canvas, item_data)
 
-frame_index = 0
-for i, item in enumerate(demo_data):
-    for _ in range(FRAMES_PER_ITEM):
-        frame = create_frame(item, frame_index)
-        video.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-        frame_index += 1
+    # Convert to RGB before saving to video (OpenCV doesn't support alpha)
+    return np.array(canvas.convert("RGB"))
 
-video.release()
-print(f"Video saved as {output_video}")
\ No newline at end of file
+# Function to build the layers of a lot for the LayeredRenderer
+def create_static_layer(item_data, item_image=None):
+    # Decoded before drawing, so the composite stage only measures the drawing
+    if item_image is None:
+        item_image = item_cache.get_image(item_data["item_img"], ITEM_IMG_SIZE)
+    item_img, item_alpha = item_image
+
+    under_layer = Image.new("RGBA", (WIDTH, HEIGHT), color=(255, 255, 255, 255))
+    static_layer = under_layer.copy()
+    with metrics.stage("composite"):
+        draw_lot_content(static_layer, item_data, item_image)
+
+    # The item image is painted after the human, so it stays on top where they overlap
+    overlays = [(item_img, item_alpha, ITEM_POS)]
+    return under_layer, static_layer, overlays
+
+# Render every lot into the video; returns the number of frames written
+def generate_video():
+    load_resources()
+
+    # Create the Video writer object
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    video = cv2.VideoWriter(output_video, fourcc, FPS, (WIDTH, HEIGHT))
+
+    # Static layer is composited once per lot; each frame only redraws the gavel region
+    renderer = LayeredRenderer(WIDTH, HEIGHT)
+
+    # Each (lot, gavel state) is rendered once; repeated states go straight to the encoder
+    frame_memo = FrameMemo()
+
+    frame_index = 0
+    for i, item in enumerate(demo_data):
+        renderer.begin_lot(*create_static_layer(item))
+        frame_memo.clear()
+        for _ in range(FRAMES_PER_ITEM):
+            state = gavel_animation.state_at(frame_index)
+            frame = frame_memo.get(
+                (i, state),
+                lambda: renderer.render(gavel_animation.sprite(state), GAVEL_POS),
+            )
+            with metrics.stage("encode_write"):
+                video.write(frame)
+            frame_index += 1
+
+    with metrics.stage("encode_release"):
+        video.release()
+    metrics.count("frames_written", frame_index)
+    metrics.count("distinct_frames", frame_memo.renders)
+    print(f"Video saved as {output_video}")
+    print(f"Item image cache: {item_cache.stats()}")
+    print(f"Frame memo: {frame_memo.stats()}")
+    return frame_index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the auction video.")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    run_instrumented(args, generate_video)
@@ -0,0 +1,42 @@
+# === Sprite animation made of a finite cycle of visual states ===
+# states is a list of (sprite, n_frames); the cycle repeats forever, so any
+# frame index maps onto one of len(states) distinct looks.
+class SpriteAnimation:
+    def __init__(self, states):
+        self.sprites = [sprite for sprite, _ in states]
+        self.cycle_length = sum(n_frames for _, n_frames in states)
+        self._state_of_tick = [i for i, (_, n_frames) in enumerate(states) for _ in range(n_frames)]
+
+    def state_at(self, frame_count):
+        return self._state_of_tick[frame_count % self.cycle_length]
+
+    def sprite(self, state):
+        return self.sprites[state]
+
+    def sprite_at(self, frame_count):
+        return self.sprites[self.state_at(frame_count)]
+
+# === Memo of rendered frames keyed by (lot, animation state) ===
+# Each distinct frame is rendered once and repeats are served from the memo.
+# Rendered frames are copied because renderers reuse their output buffer.
+class FrameMemo:
+    def __init__(self):
+        self.hits = 0
+        self.renders = 0
+        self._frames = {}
+
+    def get(self, key, render):
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = render().copy()
+            self._frames[key] = frame
+            self.renders += 1
+        else:
+            self.hits += 1
+        return frame
+
+    def clear(self):
+        self._frames.clear()
+
+    def stats(self):
+        return {"entries": len(self._frames), "renders": self.renders, "hits": self.hits}
@@ -0,0 +1,141 @@
+# Importing required packages
+import numpy as np
+import cv2
+import shared_modules  # Puts the Catalogue's text and instrumentation modules on sys.path
+from instrumentation import metrics
+
+# === Premultiplied BGR layer for integer alpha blending ===
+# The layer is cropped to its visible pixels and split by alpha: opaque pixels are
+# copied straight into the frame, and only the semi-transparent (antialiased) ones are
+# blended. Those are kept premultiplied, color * alpha and 255 - alpha as uint16, so a
+# blend is div255(dst * inv_alpha + premul): the same integer math PIL uses for a
+# masked paste, so the result is bit-identical to paste + convert.
+class PremultipliedLayer:
+    def __init__(self, img, mask=None):
+        rgba = np.asarray(img if img.mode == "RGBA" else img.convert("RGBA"))
+        alpha = np.asarray(mask if mask is not None else rgba[:, :, 3], dtype=np.uint8)
+        ys, xs = np.nonzero(alpha)
+        if len(ys) == 0:
+            top = left = bottom = right = 0
+        else:
+            top, left, bottom, right = ys.min(), xs.min(), ys.max() + 1, xs.max() + 1
+        self.offset = (int(left), int(top))
+        self.size = (int(right - left), int(bottom - top))
+        alpha = alpha[top:bottom, left:right]
+        self.bgr = np.ascontiguousarray(rgba[top:bottom, left:right, 2::-1])
+
+        # Per-channel mask: a broadcast (h, w, 1) mask is several times slower in copyto
+        opaque = alpha == 255
+        self.opaque = None if opaque.all() else np.repeat(opaque[:, :, None], 3, axis=2)
+
+        self.edge_y, self.edge_x = np.nonzero((alpha > 0) & (alpha < 255))
+        edge_alpha = alpha[self.edge_y, self.edge_x].astype(np.uint16)[:, None]
+        self.edge_premul = self.bgr[self.edge_y, self.edge_x].astype(np.uint16) * edge_alpha
+        self.edge_inv_alpha = 255 - edge_alpha
+
+def to_bgr(img):
+    if img.mode == "RGBA":
+        return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+# === Layered renderer: static layer once per lot, sprite region per frame ===
+# begin_lot() receives three things for the lot:
+#   under_layer  - RGBA canvas holding everything drawn *below* the sprite
+#   static_layer - RGBA canvas holding the full lot composition without the sprite
+#   overlays     - [(image, mask, (x, y))] drawn *above* the sprite, in paint order
+# Everything is converted to BGR (and the overlays premultiplied) once per lot;
+# render() then only blends the sprite's rectangle into a reused BGR buffer with
+# NumPy integer math, so a frame needs no PIL work and no color conversion.
+class LayeredRenderer:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.under_bgr = None
+        self.static_bgr = None
+        self.overlays = []
+        self.buffer = np.empty((height, width, 3), dtype=np.uint8)
+        self.dirty_rect = None
+        self._sprites = {}
+
+    def begin_lot(self, under_layer, static_layer, overlays=()):
+        with metrics.stage("color_convert"):
+            self.under_bgr = to_bgr(under_layer)
+            self.static_bgr = to_bgr(static_layer)
+            self.overlays = [(PremultipliedLayer(img, mask), position) for img, mask, position in overlays]
+        np.copyto(self.buffer, self.static_bgr)
+        self.dirty_rect = None
+
+    # Premultiplied copy of a sprite, made on first use (the sprite is kept so its id stays unique)
+    def _sprite_layer(self, sprite):
+        entry = self._sprites.get(id(sprite))
+        if entry is None:
+            entry = (sprite, PremultipliedLayer(sprite))
+            self._sprites[id(sprite)] = entry
+        return entry[1]
+
+    def _clip(self, position, size):
+        x, y = position
+        return (max(x, 0), max(y, 0), min(x + size[0], self.width), min(y + size[1], self.height))
+
+    def _restore(self, rect):
+        x0, y0, x1, y1 = rect
+        self.buffer[y0:y1, x0:x1] = self.static_bgr[y0:y1, x0:x1]
+
+    # Blend `layer` placed at `position` into the buffer, limited to `rect`
+    def _blend(self, layer, position, rect):
+        lx, ly = position[0] + layer.offset[0], position[1] + layer.offset[1]
+        w, h = layer.size
+        x0, y0 = max(rect[0], lx), max(rect[1], ly)
+        x1, y1 = min(rect[2], lx + w), min(rect[3], ly + h)
+        if x1 <= x0 or y1 <= y0:
+            return
+        sx0, sy0, sx1, sy1 = x0 - lx, y0 - ly, x1 - lx, y1 - ly
+        dst = self.buffer[y0:y1, x0:x1]
+        if layer.opaque is None:
+            dst[...] = layer.bgr[sy0:sy1, sx0:sx1]
+        else:
+            np.copyto(dst, layer.bgr[sy0:sy1, sx0:sx1], where=layer.opaque[sy0:sy1, sx0:sx1])
+
+        if len(layer.edge_y) == 0:
+            return
+        ey, ex = layer.edge_y, layer.edge_x
+        premul, inv_alpha = layer.edge_premul, layer.edge_inv_alpha
+        if (sx0, sy0, sx1, sy1) != (0, 0, w, h):
+            keep = (ey >= sy0) & (ey < sy1) & (ex >= sx0) & (ex < sx1)
+            ey, ex, premul, inv_alpha = ey[keep], ex[keep], premul[keep], inv_alpha[keep]
+        rows, cols = ey - sy0, ex - sx0
+        v = dst[rows, cols] * inv_alpha + premul
+        # div255, rounded: (v + 128 + ((v + 128) >> 8)) >> 8
+        v += 128
+        v += v >> 8
+        v >>= 8
+        dst[rows, cols] = v
+
+    # Replace a box of the static layer (a panel that changed) with `patch`, an RGBA image.
+    # The box must not overlap the sprite's rectangle, which render() rebuilds from the
+    # under layer, or an overlay.
+    def update_static(self, patch, position):
+        x, y = position
+        bgr = to_bgr(patch)
+        h, w = bgr.shape[:2]
+        self.static_bgr[y:y + h, x:x + w] = bgr
+        self.buffer[y:y + h, x:x + w] = bgr
+
+    def render(self, sprite, position):
+        layer = self._sprite_layer(sprite)
+        rect = self._clip(position, sprite.size)
+        if self.dirty_rect is not None and self.dirty_rect != rect:
+            self._restore(self.dirty_rect)
+        x0, y0, x1, y1 = rect
+        if x1 <= x0 or y1 <= y0:
+            self.dirty_rect = None
+            return self.buffer
+
+        with metrics.stage("composite"):
+            self.buffer[y0:y1, x0:x1] = self.under_bgr[y0:y1, x0:x1]
+            self._blend(layer, position, rect)
+            for overlay, overlay_position in self.overlays:
+                self._blend(overlay, overlay_position, rect)
+
+        self.dirty_rect = rect
+        return self.buffer
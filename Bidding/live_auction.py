@@ -0,0 +1,364 @@
+# Importing required packages
+import argparse
+import json
+import queue
+import socket
+import threading
+import time
+import numpy as np
+import cv2
+from PIL import ImageDraw
+
+import shared_modules  # Puts the Catalogue's text and instrumentation modules on sys.path
+import bidding
+from bidding import (FPS, WIDTH, HEIGHT, GAVEL_POS, ITEM_DISPLAY_DURATION, ITEM_IMG_SIZE, PRICE_BOX, BIDDER_BOX,
+                     demo_data, create_static_layer, draw_price_panel, draw_bidder_panel, load_resources)
+from instrumentation import add_instrumentation_arguments, metrics, run_instrumented
+from layered_renderer import LayeredRenderer
+
+# Configuration
+output_video = "live_auction.mp4"  # Recording of the live show, one frame per 1/FPS seconds of wall time
+listen_address = ("127.0.0.1", 9876)  # Where --listen waits for the auction backend
+max_duration = None  # Seconds to run; None = until the "end" event
+min_render_budget = 0.004  # Seconds before a deadline at which events are latched for its frame
+
+# Shown once the hammer is down, below the bidder panel
+STATUS_BOX = [(770, 480), (1220, 540)]
+HAMMER_DOWN_STATE = 0  # gavel_animation state showing the hammer on the block
+
+# === Bid events ===
+# Events are dicts with a "type":
+#   {"type": "lot_opened", "item_img": ..., "description": ..., "price": ..., "bidder": ...}
+#   {"type": "bid", "price": ..., "bidder": ...}
+#   {"type": "hammer_down"}
+#   {"type": "end"}  - nothing more to show; the renderer stops
+# A lot_opened event carries the same fields as a demo_data item. Bids and the hammer
+# apply to the open lot; events for a lot that is not open (or already sold), events
+# missing a field their type needs and lots whose item image cannot be loaded are
+# ignored. On the renderer's queue every
+# event also has "received", the time.perf_counter() at which it arrived.
+EVENT_FIELDS = {
+    "lot_opened": ("item_img", "description", "price", "bidder"),
+    "bid": ("price", "bidder"),
+}
+
+# What is wrong with an event, or None if it can be applied
+def event_problem(event):
+    if not isinstance(event, dict) or "type" not in event:
+        return "event without a type"
+    missing = [key for key in EVENT_FIELDS.get(event["type"], ()) if key not in event]
+    if missing:
+        return f"{event['type']} event without {', '.join(missing)}"
+    return None
+
+def receive(events, event):
+    event["received"] = time.perf_counter()
+    events.put(event)
+
+def drain(events):
+    while True:
+        try:
+            yield events.get_nowait()
+        except queue.Empty:
+            return
+
+# === Socket source: one JSON event per line over a local TCP connection ===
+# Connections are served one after another until an "end" event arrives. A line that
+# is not a JSON event with a "type" and the fields of that type is reported, counted
+# as an ignored event and skipped, and a connection that breaks only ends itself. If the server stops for any other reason, an "end" event
+# is queued so that the renderer does not wait forever.
+def parse_event(line):
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError as e:
+        print(f"Skipping malformed event {line.strip()[:80]!r}: {e}")
+        metrics.count("events_ignored")
+        return None
+    problem = event_problem(event)
+    if problem is not None:
+        print(f"Skipping {problem}: {line.strip()[:80]!r}")
+        metrics.count("events_ignored")
+        return None
+    return event
+
+def serve_connection(conn, events):
+    with conn, conn.makefile("r", encoding="utf-8", errors="replace") as lines:
+        for line in lines:
+            event = parse_event(line) if line.strip() else None
+            if event is None:
+                continue
+            receive(events, event)
+            if event["type"] == "end":
+                return True
+    return False
+
+def listen_events(address, events):
+    server = socket.create_server(address)
+
+    def serve():
+        try:
+            with server:
+                while True:
+                    conn, _ = server.accept()
+                    try:
+                        if serve_connection(conn, events):
+                            return
+                    except OSError as e:
+                        print(f"Bid event connection lost: {e}")
+        except BaseException as e:
+            print(f"Bid event listener stopped: {e!r}")
+            receive(events, {"type": "end"})
+            raise
+
+    threading.Thread(target=serve, daemon=True).start()
+    print(f"Waiting for bid events on {address[0]}:{address[1]}")
+
+def parse_address(text):
+    host, port = text.rsplit(":", 1)
+    return (host, int(port))
+
+# === Local replayer, standing in for the auction backend ===
+# A script is a list of events, each with "at": seconds from the start of the replay.
+# Events are sent in order at their time (divided by `speed`) through send(event),
+# which puts them on a queue in-process or writes them to the renderer's socket.
+def load_events(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def replay_events(script, send, speed=1.0):
+    start = time.perf_counter()
+    for event in script:
+        delay = start + event.get("at", 0) / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        send({key: value for key, value in event.items() if key != "at"})
+
+def start_replay(script, events, speed=1.0):
+    thread = threading.Thread(target=replay_events, args=(script, lambda event: receive(events, event), speed), daemon=True)
+    thread.start()
+    return thread
+
+def socket_sender(address):
+    conn = socket.create_connection(address)
+
+    def send(event):
+        conn.sendall((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+        if event["type"] == "end":
+            conn.close()
+    return send
+
+# Demo script: every demo_data lot opens below its final price, takes a few bids up
+# to it and is sold a second before the next lot opens.
+def demo_events(lot_seconds=ITEM_DISPLAY_DURATION + 1, bids_per_lot=3):
+    bidders = [item["bidder"] for item in demo_data]
+    script = []
+    for n, item in enumerate(demo_data):
+        start = n * lot_seconds
+        final_price = int(item["price"].lstrip("₹").replace(",", ""))
+        step = final_price // 10
+        script.append({**item, "at": start, "type": "lot_opened",
+                       "price": f"₹{final_price - bids_per_lot * step:,}", "bidder": "No bids yet"})
+        for k in range(1, bids_per_lot + 1):
+            script.append({
+                "at": start + k * (lot_seconds - 1) / (bids_per_lot + 1),
+                "type": "bid",
+                "price": f"₹{final_price - (bids_per_lot - k) * step:,}",
+                "bidder": item["bidder"] if k == bids_per_lot else bidders[(n + k) % len(bidders)],
+            })
+        script.append({"at": start + lot_seconds - 1, "type": "hammer_down"})
+    script.append({"at": len(demo_data) * lot_seconds, "type": "end"})
+    return script
+
+# === Live show state ===
+# Events only record what changed; the drawing happens in render(), so a tick that is
+# dropped leaves the renderer's buffer (the frame on screen) untouched, and several
+# bids between two frames cost one panel redraw. A new lot is composited once
+# (LayeredRenderer.begin_lot); a bid redraws the price and bidder panels and the
+# hammer the status panel, each only inside its own box.
+def draw_status_panel(draw, lot):
+    draw.rectangle(STATUS_BOX, fill="#FFF8E1", outline="darkorange", width=2)
+    draw.text((780, 498), f"SOLD to {lot['bidder']} at {lot['price']}", font=bidding.font_small, fill=(200, 90, 0))
+
+PANELS = {
+    "price": (PRICE_BOX, lambda draw, lot: draw_price_panel(draw, lot["price"])),
+    "bidder": (BIDDER_BOX, lambda draw, lot: draw_bidder_panel(draw, lot["bidder"])),
+    "status": (STATUS_BOX, draw_status_panel),
+}
+
+class LiveShow:
+    def __init__(self):
+        self.renderer = LayeredRenderer(WIDTH, HEIGHT)
+        self.blank = np.full((HEIGHT, WIDTH, 3), 255, dtype=np.uint8)  # Shown until the first lot opens
+        self.lot = None
+        self.item_image = None  # (image, alpha) of the lot's item, loaded when the lot opens
+        self.sold = False
+        self.static_layer = None  # RGBA static layer of the lot on screen, kept to redraw its panels
+        self.lot_tick = 0
+        self.new_lot = False
+        self.stale_panels = set()
+        self.shown_state = None
+
+    # Returns False for an event that does not apply to the open lot
+    def apply(self, event):
+        if event_problem(event) is not None:
+            return False
+        kind = event["type"]
+        if kind == "lot_opened":
+            # Loaded here rather than in render(), so a lot whose image is missing or
+            # unreadable is turned away and the current lot stays on screen
+            try:
+                self.item_image = bidding.item_cache.get_image(event["item_img"], ITEM_IMG_SIZE)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring lot with item image {event['item_img']!r}: {e}")
+                return False
+            self.lot = {key: event[key] for key in ("item_img", "description", "price", "bidder")}
+            self.sold = False
+            self.new_lot = True
+            self.stale_panels.clear()
+        elif self.lot is None or self.sold:
+            return False
+        elif kind == "bid":
+            self.lot["price"] = event["price"]
+            self.lot["bidder"] = event["bidder"]
+            self.stale_panels.update(("price", "bidder"))
+        elif kind == "hammer_down":
+            self.sold = True
+            self.stale_panels.add("status")
+        else:
+            return False
+        return True
+
+    def gavel_state(self, tick):
+        if self.sold:
+            return HAMMER_DOWN_STATE
+        return bidding.gavel_animation.state_at(tick - self.lot_tick)
+
+    def needs_render(self, tick):
+        if self.lot is None:
+            return False
+        return self.new_lot or bool(self.stale_panels) or self.gavel_state(tick) != self.shown_state
+
+    def redraw_panel(self, name):
+        box, draw_panel = PANELS[name]
+        with metrics.stage("panel_redraw"):
+            draw_panel(ImageDraw.Draw(self.static_layer), self.lot)
+            (x0, y0), (x1, y1) = box
+            self.renderer.update_static(self.static_layer.crop((x0, y0, x1 + 1, y1 + 1)), (x0, y0))
+
+    def render(self, tick):
+        if self.new_lot:
+            under_layer, self.static_layer, overlays = create_static_layer(self.lot, self.item_image)
+            self.renderer.begin_lot(under_layer, self.static_layer, overlays)
+            self.lot_tick = tick
+            self.new_lot = False
+            # The static layer already shows the latest price and bidder
+            self.stale_panels.difference_update(("price", "bidder"))
+        for name in sorted(self.stale_panels):
+            self.redraw_panel(name)
+        self.stale_panels.clear()
+        self.shown_state = self.gavel_state(tick)
+        return self.renderer.render(bidding.gavel_animation.sprite(self.shown_state), GAVEL_POS)
+
+# === Deadline scheduler: one frame every 1/FPS seconds of wall time ===
+# Tick n's frame is due at start + (n + 1) / FPS. A tick waits until a render budget
+# before its deadline, so events arriving during the wait still make this frame, then
+# applies the events that have arrived and renders only if something on screen
+# changed (a new lot, a panel, the gavel's state); otherwise the last frame is
+# repeated. The budget follows the recent time from waking to a rendered frame
+# (applying the events, which decodes a new lot's image, and rendering): it jumps to
+# a slow frame and decays by 20% per frame, never below min_render_budget. A tick that wakes after its
+# deadline has passed is dropped: the last frame is repeated without rendering, so
+# the recording stays in step with the wall clock. An event's latency runs from its
+# arrival to the presentation of the first frame that shows it.
+def run_live(events, sink, max_duration=None):
+    show = LiveShow()
+    period = 1 / FPS
+    budget = min_render_budget
+    frame = show.blank
+    unseen = []  # Arrival times of applied events not on screen yet
+    finished = False
+    tick = 0
+    start = time.perf_counter()
+    while not finished:
+        deadline = start + (tick + 1) * period
+        delay = deadline - budget - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        woke = time.perf_counter()
+        for event in drain(events):
+            if event.get("type") == "end":
+                finished = True
+            elif show.apply(event):
+                unseen.append(event["received"])
+            else:
+                metrics.count("events_ignored")
+
+        rendered = False
+        if woke > deadline:
+            metrics.count("frames_dropped")
+        elif show.needs_render(tick):
+            frame = show.render(tick)
+            budget = max(budget, min(period, 1.25 * (time.perf_counter() - woke)))
+            rendered = True
+            metrics.count("frames_rendered")
+        else:
+            metrics.count("frames_repeated")
+
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with metrics.stage("encode_write"):
+            sink.write(frame)
+        if rendered:
+            presented = time.perf_counter()
+            for received in unseen:
+                metrics.observe("event_to_screen", presented - received)
+            unseen.clear()
+        budget = max(min_render_budget, 0.8 * budget)
+        tick += 1
+        if max_duration is not None and tick >= max_duration * FPS:
+            break
+    metrics.count("frames_written", tick)
+    return tick
+
+# Render the live show into output_video; start_source() begins feeding `events` once
+# the resources are loaded, so startup does not count as latency.
+def live_video(events, start_source):
+    load_resources()
+
+    # Create the Video writer object
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    video = cv2.VideoWriter(output_video, fourcc, FPS, (WIDTH, HEIGHT))
+    start_source()
+    try:
+        frames = run_live(events, video, max_duration)
+    finally:
+        with metrics.stage("encode_release"):
+            video.release()
+    print(f"Video saved as {output_video}")
+    print(f"Item image cache: {bidding.item_cache.stats()}")
+    return frames
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the auction live from bid events.")
+    parser.add_argument("--listen", nargs="?", const=f"{listen_address[0]}:{listen_address[1]}",
+                        help="Read events from a TCP socket at HOST:PORT instead of replaying them")
+    parser.add_argument("--replay", help="Replay this JSON-lines event script (default: the demo lots)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor")
+    parser.add_argument("--send-to", help="Only act as the backend: replay the script to a renderer listening at HOST:PORT")
+    parser.add_argument("--duration", type=float, default=max_duration, help="Stop after this many seconds")
+    parser.add_argument("--output", default=output_video, help="Recording of the live show")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+    script = load_events(args.replay) if args.replay else demo_events()
+    if args.send_to:
+        replay_events(script, socket_sender(parse_address(args.send_to)), args.speed)
+    else:
+        output_video = args.output
+        max_duration = args.duration
+        events = queue.Queue()
+        if args.listen:
+            start_source = lambda: listen_events(parse_address(args.listen), events)
+        else:
+            start_source = lambda: start_replay(script, events, args.speed)
+        run_instrumented(args, live_video, events, start_source)
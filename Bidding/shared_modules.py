@@ -0,0 +1,12 @@
+# Importing required packages
+import os
+import sys
+
+# === Modules shared with the Catalogue scripts ===
+# The font registry and word wrap (text_render) and the render instrumentation
+# (instrumentation) live next to the Catalogue scripts, and one copy of each serves
+# both. Bidding modules import this module before them; it adds the Catalogue
+# directory to sys.path once, after Bidding's own modules.
+CATALOGUE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Catalogue")
+if CATALOGUE_DIR not in sys.path:
+    sys.path.append(CATALOGUE_DIR)
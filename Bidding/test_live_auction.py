@@ -0,0 +1,128 @@
+# Importing required packages
+import json
+import os
+import queue
+import time
+import numpy as np
+import pytest
+from PIL import Image
+
+import bidding
+import live_auction
+from instrumentation import metrics
+
+FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/Library/Fonts/Arial.ttf",
+    r"C:/Windows/Fonts/arial.ttf",
+)
+SPEED = 4  # Replay speed: the three demo lots take 3 seconds
+SLOW_WRITE = 10  # This write stalls for a few frame periods, so the next tick misses its deadline
+
+# === Stand-ins for the auction assets and the video writer ===
+class StubSink:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(frame.shape)
+        if len(self.frames) == SLOW_WRITE:
+            time.sleep(3 / bidding.FPS)
+
+@pytest.fixture
+def demo_lots(tmp_path, monkeypatch):
+    font_path = next((path for path in FONT_CANDIDATES if os.path.exists(path)), None)
+    if font_path is None:
+        pytest.skip("No TrueType font found")
+    rng = np.random.default_rng(0)
+    for name in ("human", "hammer_down"):
+        Image.fromarray(rng.integers(0, 256, (160, 120, 4), dtype=np.uint8)).save(tmp_path / f"{name}.png")
+    lots = []
+    for n, (price, bidder) in enumerate([("₹12,000", "Alice"), ("₹5,500", "Bob"), ("₹80,000", "Carol")]):
+        path = tmp_path / f"{n}.jpg"
+        Image.fromarray(rng.integers(0, 256, (300, 300, 3), dtype=np.uint8)).save(path)
+        lots.append({"item_img": str(path), "description": f"Lot {n} " * 20, "price": price, "bidder": bidder})
+    monkeypatch.setattr(bidding, "human_img_path", str(tmp_path / "human.png"))
+    monkeypatch.setattr(bidding, "hammer_down_img_path", str(tmp_path / "hammer_down.png"))
+    monkeypatch.setattr(bidding, "font_path", font_path)
+    monkeypatch.setattr(live_auction, "demo_data", lots)
+    bidding.load_resources()
+    metrics.reset()
+    return lots
+
+# === Live mode: demo replay at high speed ===
+# Besides the demo events the script has a bid before any lot is open and a bid half a
+# second after every hammer, all of which the renderer must ignore.
+def test_live_replay(demo_lots):
+    lot_seconds = bidding.ITEM_DISPLAY_DURATION + 1
+    script = live_auction.demo_events(lot_seconds)
+    script.insert(0, {"at": 0, "type": "bid", "price": "₹1", "bidder": "Too early"})
+    for n in range(len(demo_lots)):
+        script.append({"at": (n + 1) * lot_seconds - 0.5, "type": "bid", "price": "₹1", "bidder": "Too late"})
+    script.sort(key=lambda event: event["at"])
+
+    events = queue.Queue()
+    sink = StubSink()
+    replay = live_auction.start_replay(script, events, SPEED)
+    frames = live_auction.run_live(events, sink)
+    replay.join()
+
+    counters = metrics.summary()["counters"]
+    assert frames == len(sink.frames) == counters["frames_written"]
+    assert set(sink.frames) == {(bidding.HEIGHT, bidding.WIDTH, 3)}
+    assert counters["events_ignored"] == 1 + len(demo_lots)
+    assert counters["frames_rendered"] >= len(demo_lots)
+    assert counters.get("frames_repeated", 0) > 0
+    assert counters.get("frames_dropped", 0) > 0
+    assert (counters["frames_rendered"] + counters.get("frames_repeated", 0)
+            + counters.get("frames_dropped", 0)) == frames
+    # The show ran about as long as the replay, one frame per period of wall time
+    assert frames >= len(demo_lots) * lot_seconds / SPEED * bidding.FPS
+
+# === Events missing the fields of their type ===
+# They are skipped on the socket and ignored by the renderer, which keeps the show going.
+LOT = {"item_img": "0.jpg", "description": "Vase", "price": "₹10", "bidder": "Alice"}
+INCOMPLETE_EVENTS = [
+    *({"type": "lot_opened", **{key: value for key, value in LOT.items() if key != missing}} for missing in LOT),
+    {"type": "bid", "price": "₹9"},
+    {"type": "bid", "bidder": "Bob"},
+]
+
+def run_events(script):
+    events = queue.Queue()
+    for event in script:
+        live_auction.receive(events, event)
+    sink = StubSink()
+    frames = live_auction.run_live(events, sink)
+    return frames, len(sink.frames), metrics.summary()["counters"]
+
+@pytest.mark.parametrize("event", INCOMPLETE_EVENTS)
+def test_parse_event_skips_incomplete_events(event):
+    metrics.reset()
+    assert live_auction.parse_event(json.dumps(event)) is None
+    assert metrics.summary()["counters"]["events_ignored"] == 1
+
+@pytest.mark.parametrize("event", INCOMPLETE_EVENTS)
+def test_live_ignores_incomplete_events(demo_lots, event):
+    bid = {"type": "bid", "price": "₹13,000", "bidder": "Bob"}
+    frames, written, counters = run_events([{"type": "lot_opened", **demo_lots[0]}, event, bid, {"type": "end"}])
+    assert frames == written == 1
+    assert counters["events_ignored"] == 1
+    assert counters["frames_rendered"] == 1
+
+# === Lots whose item image cannot be loaded ===
+# The lot is turned away before it reaches render(); the current lot stays on screen
+# and still takes bids.
+@pytest.mark.parametrize("contents", [None, b"not an image"])
+def test_live_ignores_lot_with_bad_image(demo_lots, tmp_path, contents):
+    path = tmp_path / "bad.jpg"
+    if contents is not None:
+        path.write_bytes(contents)
+    bad_lot = {**demo_lots[1], "type": "lot_opened", "item_img": str(path)}
+    bid = {"type": "bid", "price": "₹13,000", "bidder": "Bob"}
+    frames, written, counters = run_events([{"type": "lot_opened", **demo_lots[0]}, bad_lot, bid, {"type": "end"}])
+    assert frames == written == 1
+    assert counters["events_ignored"] == 1
+    assert counters["frames_rendered"] == 1
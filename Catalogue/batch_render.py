@@ -0,0 +1,185 @@
+# Importing required packages
+import argparse
+import csv
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import Metrics, metrics
+
+# === Batch rendering of many catalogues in one long-lived process ===
+# Each job names the script style to use and overrides that script's module settings.
+# The script modules are imported once per process, so fonts, caches and the encoder
+# setup are shared by every job that process runs.
+
+# Catalogue styles, one per script
+STYLES = ("normal_video", "final_animate", "bgimage_background", "diff_size_image_video")
+
+# Settings a job may override; anything not given falls back to the script's default
+JOB_SETTINGS = (
+    "image_folder", "descriptions", "output_video", "bg_image_path",
+    "seconds_per_frame", "encoder_backend", "encoder_queue_depth", "block_cache_dir",
+    "segment_cache_dir", "font_path", "transition", "renditions", "stream_dir", "layout", "layout_columns",
+)
+REQUIRED_SETTINGS = ("style", "image_folder", "descriptions", "output_video")
+PATH_SETTINGS = ("image_folder", "output_video", "bg_image_path", "descriptions_file", "block_cache_dir",
+                 "segment_cache_dir", "font_path", "stream_dir")
+
+# Script defaults captured on first import, restored before every job
+script_defaults = {}
+
+# === Manifest loading (JSON list / {"jobs": [...]} or CSV) ===
+# Relative paths in a manifest are resolved against the manifest's directory.
+# In CSV, descriptions (and rendition heights) are separated by "|"; descriptions can
+# also be read from a descriptions_file with one description per line.
+def parse_csv_row(row):
+    job = {key: value for key, value in row.items() if value not in (None, "")}
+    if "descriptions" in job:
+        job["descriptions"] = [d.strip() for d in job["descriptions"].split("|")]
+    if "seconds_per_frame" in job:
+        job["seconds_per_frame"] = float(job["seconds_per_frame"])
+    if "encoder_queue_depth" in job:
+        job["encoder_queue_depth"] = int(job["encoder_queue_depth"])
+    if "layout_columns" in job:
+        job["layout_columns"] = int(job["layout_columns"])
+    if "renditions" in job:
+        job["renditions"] = [int(height) for height in job["renditions"].split("|")]
+    return job
+
+def resolve_job(job, base_dir):
+    job = dict(job)
+    for key in PATH_SETTINGS:
+        if key in job and not os.path.isabs(job[key]):
+            job[key] = os.path.join(base_dir, job[key])
+    if "descriptions_file" in job:
+        with open(job.pop("descriptions_file"), encoding="utf-8") as f:
+            job["descriptions"] = [line.strip() for line in f if line.strip()]
+    return job
+
+def validate_job(job, index):
+    missing = [key for key in REQUIRED_SETTINGS if key not in job]
+    if missing:
+        raise ValueError(f"Job {index}: missing {', '.join(missing)}")
+    if job["style"] not in STYLES:
+        raise ValueError(f"Job {index}: unknown style '{job['style']}'. Choose from: {', '.join(STYLES)}")
+    unknown = [key for key in job if key != "style" and key not in JOB_SETTINGS]
+    if unknown:
+        raise ValueError(f"Job {index}: unknown setting(s) {', '.join(unknown)}")
+
+def load_manifest(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        jobs = data["jobs"] if isinstance(data, dict) else data
+    elif ext == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            jobs = [parse_csv_row(row) for row in csv.DictReader(f)]
+    else:
+        raise ValueError(f"Unsupported manifest format '{ext}' (use .json or .csv)")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = [resolve_job(job, base_dir) for job in jobs]
+    for index, job in enumerate(jobs):
+        validate_job(job, index)
+    return jobs
+
+# === Run one job with the script's module settings swapped in ===
+def get_script(style):
+    module = importlib.import_module(style)
+    if style not in script_defaults:
+        script_defaults[style] = {key: getattr(module, key) for key in JOB_SETTINGS if hasattr(module, key)}
+    return module
+
+def run_job(job):
+    module = get_script(job["style"])
+    defaults = script_defaults[job["style"]]
+    unused = [key for key in job if key != "style" and key not in defaults]
+    if unused:
+        raise ValueError(f"Setting(s) {', '.join(unused)} not used by style '{job['style']}'")
+    for key, default in defaults.items():
+        setattr(module, key, job.get(key, default))
+
+    metrics.reset()
+    start = time.perf_counter()
+    frames_written = module.generate_video()
+    elapsed = time.perf_counter() - start
+    summary = metrics.summary()
+    return {
+        "output_video": job["output_video"],
+        "style": job["style"],
+        "items": len(job["descriptions"]),
+        "frames": frames_written,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames_written / elapsed, 1) if elapsed > 0 else None,
+        "bound_by": summary["bound_by"],
+        "stages": summary["stages"],
+        "snapshot": metrics.snapshot(),
+    }
+
+# A failed job is reported and the batch carries on
+def run_job_safely(job):
+    try:
+        return run_job(job)
+    except Exception as e:
+        return {"output_video": job["output_video"], "style": job["style"], "error": f"{type(e).__name__}: {e}"}
+
+# === Run the whole manifest, serially or on a pool of long-lived worker processes ===
+# The stage timings of every job, whichever process ran it, add up to the batch's.
+def run_batch(jobs, workers=1):
+    start = time.perf_counter()
+    batch_metrics = Metrics()
+    results = []
+
+    def finish(result):
+        if "snapshot" in result:
+            batch_metrics.merge(result.pop("snapshot"))
+        report_job(result)
+        results.append(result)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(run_job_safely, jobs):
+                finish(result)
+    else:
+        for job in jobs:
+            finish(run_job_safely(job))
+    elapsed = time.perf_counter() - start
+    stages = batch_metrics.summary()
+
+    done = [r for r in results if "error" not in r]
+    total_frames = sum(r["frames"] for r in done)
+    summary = {
+        "jobs": len(results),
+        "failed": len(results) - len(done),
+        "frames": total_frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(total_frames / elapsed, 1) if elapsed > 0 else None,
+        "jobs_per_minute": round(len(results) * 60 / elapsed, 1) if elapsed > 0 else None,
+        "bound_by": stages["bound_by"],
+        "stages": stages["stages"],
+    }
+    return {"summary": summary, "jobs": results}
+
+def report_job(result):
+    if "error" in result:
+        print(f"[FAILED] {result['output_video']}: {result['error']}")
+    else:
+        print(f"[done] {result['output_video']}: {result['items']} items, {result['frames']} frames "
+              f"in {result['seconds']}s ({result['fps']} fps)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every catalogue listed in a JSON or CSV manifest.")
+    parser.add_argument("manifest", help="Path to a .json or .csv manifest")
+    parser.add_argument("--workers", type=int, default=1, help="Render jobs in N long-lived worker processes")
+    parser.add_argument("--report", help="Write per-job throughput and the batch summary to this JSON file")
+    args = parser.parse_args()
+
+    batch = run_batch(load_manifest(args.manifest), workers=args.workers)
+    print("Batch summary:", {key: value for key, value in batch["summary"].items() if key != "stages"})
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(batch, f, indent=2)
+    sys.exit(1 if batch["summary"]["failed"] else 0)
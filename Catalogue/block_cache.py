@@ -0,0 +1,165 @@
+# Importing required packages
+import argparse
+import hashlib
+import os
+import threading
+import numpy as np
+
+# === Content-addressed on-disk cache of annotated image blocks ===
+# A block's key is a hash of the source image bytes plus everything that shapes the
+# block (target size, description, font, layout settings), so an unchanged item is
+# never decoded, fitted or text-rendered again. Blocks are stored as raw .npy files
+# and loaded memory-mapped. A file's mtime records its last use; once the cache
+# grows past max_bytes the least recently used blocks are deleted. get() may be called
+# from several threads; put() and evict() belong to one thread.
+class BlockCache:
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries, self.total_bytes = self._usage()
+
+    @staticmethod
+    def key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".npy")
+
+    def _files(self):
+        for sub in os.scandir(self.cache_dir):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(".npy"):
+                        yield entry
+
+    def _usage(self):
+        sizes = [entry.stat().st_size for entry in self._files()]
+        return len(sizes), sum(sizes)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            block = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError):
+            # Truncated or corrupt entry: drop it and rebuild
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return block
+
+    def put(self, key, block):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(block))
+        os.replace(tmp_path, path)
+        self.writes += 1
+        self.entries += 1
+        self.total_bytes += os.path.getsize(path)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def get_or_build(self, key, build):
+        block = self.get(key)
+        if block is None:
+            block = build()
+            self.put(key, block)
+        return block
+
+    # False when the file could not be deleted, e.g. on Windows while a block loaded
+    # from it is still memory-mapped; it stays in place for the next eviction.
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+        with self._lock:
+            self.entries -= 1
+            self.total_bytes -= size
+        return True
+
+    # Delete least recently used blocks until the cache is back under 90% of its cap.
+    # Blocks that cannot be deleted right now are skipped.
+    def evict(self):
+        files = sorted(self._files(), key=lambda entry: entry.stat().st_mtime)
+        self.entries, self.total_bytes = len(files), sum(entry.stat().st_size for entry in files)
+        target = self.max_bytes * 0.9
+        for entry in files:
+            if self.total_bytes <= target:
+                break
+            if self._remove(entry.path):
+                self.evictions += 1
+
+    def stats(self):
+        return {
+            "entries": self.entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+# === One cache object per directory per process (shared by batch jobs) ===
+block_caches = {}
+
+def get_block_cache(cache_dir, max_bytes=2 * 1024 ** 3):
+    cache = block_caches.get(cache_dir)
+    if cache is None:
+        cache = BlockCache(cache_dir, max_bytes)
+        block_caches[cache_dir] = cache
+    return cache
+
+# Hash of a source file's bytes, or None if it does not exist
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None
+
+# Cache lookup for one catalogue item, safe to run on an ingest thread. Returns
+# (key, cached block or None, image from load(path) when the block is missing).
+def lookup_block(cache, path, settings, description, load):
+    digest = file_digest(path)
+    if digest is None:
+        raise ValueError(f"Image {path} not found.")
+    key = cache.key(digest, settings, description)
+    block = cache.get(key)
+    return key, block, load(path) if block is None else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report on (and optionally trim) a block cache directory.")
+    parser.add_argument("cache_dir")
+    parser.add_argument("--max-bytes", type=int, help="Evict least recently used blocks down to this size")
+    args = parser.parse_args()
+
+    cache = BlockCache(args.cache_dir, args.max_bytes or 2 * 1024 ** 3)
+    if args.max_bytes is not None and cache.total_bytes > args.max_bytes:
+        cache.evict()
+    stats = cache.stats()
+    print(f"{stats['entries']} blocks, {stats['bytes'] / 1024 ** 2:.1f} MiB "
+          f"(cap {stats['max_bytes'] / 1024 ** 2:.1f} MiB), {stats['evictions']} evicted")
@@ -1,19 +1,43 @@
 # Importing required packages
-import cv2
 import os
-from PIL import Image, ImageDraw, ImageFont
+import sys
+import cv2
+from PIL import Image
 import numpy as np
-import textwrap
+from block_cache import file_digest
+from frame_pool import FramePool, solid_plate
+from image_ingest import open_image, resize_image
+from instrumentation import metrics, run_instrumented
+from layout import LAYOUTS, check_layout, plan_layout
+from pipeline import apply_arguments, argument_parser, render_video
+from text_render import text_block
+from transitions import TRANSITIONS, transition_frames
 
 # === Configuration ===
 image_folder = r"C:\Users\Webbies\Jupyter_Notebooks\VideoCreation_From_Image\images2"
 output_video = "Modified_DiffImageSize_Video.mp4"
 font_size = 16
+font_path = r"C:/Windows/Fonts/arial.ttf"
 line_spacing = font_size + 5
 max_lines = 4
 text_padding = 10
 blue_bg = (90, 40, 10)
 fps = 30
+codec = 'mp4v'
+encoder_backend = "opencv"  # "opencv" or "ffmpeg" (holds stored once, variable frame rate)
+encoder_queue_depth = 0  # > 0 encodes on a separate thread with this many frames in flight
+block_cache_dir = None  # Directory that keeps annotated blocks between runs (None = rebuild every run)
+block_cache_max_bytes = 2 * 1024 ** 3  # Least recently used blocks are evicted past this size
+ingest_workers = 4  # Threads reading and decoding images ahead of use (1 = one at a time, inline)
+ingest_read_ahead = 8  # Images in flight ahead of the one being annotated (about two groups)
+segment_cache_dir = None  # Directory that keeps each group's encoded segment between runs (needs ffmpeg)
+stream_dir = None  # Directory for a progressive HLS stream (playlist.m3u8, one segment per group; needs ffmpeg)
+renditions = []  # Extra frame heights encoded from the same frames, e.g. [720, 480] (written as <name>_720p.<ext>)
+transition = "slide"  # Entry animation between groups: "cut", "slide", "push", "crossfade" or "wipe"
+
+# Layout of a group's blocks (see layout.py)
+layout = "grid"  # "grid" (rows of layout_columns blocks) or "masonry" (each block under the shortest column)
+layout_columns = 2
 
 # Gaps
 image_gap_x = 40
@@ -24,10 +48,11 @@ top_padding = 30
 # Target size for image area (before adding text)
 TARGET_IMG_WIDTH = 300
 TARGET_IMG_HEIGHT = 400
+decode_reduced = True  # Decode JPEGs at 1/2, 1/4 or 1/8 scale when the target is much smaller
+resize_preset = "quality"  # "quality" (Lanczos), "balanced" (area) or "fast" (bilinear)
 
 # Timings
 seconds_per_frame = 3
-repeats_per_frame = fps * seconds_per_frame
 slide_duration = 1  # seconds for entry animation
 slide_frames = int(fps * slide_duration)
 
@@ -44,132 +69,133 @@ descriptions = [
 ]
 
 # === Object-fit: cover logic ===
-def object_fit_cover(img: Image.Image, target_width: int, target_height: int) -> Image.Image:
+def object_fit_cover(img: Image.Image, target_width: int, target_height: int, preset: str = "quality") -> Image.Image:
     img_ratio = img.width / img.height
     target_ratio = target_width / target_height
     if img_ratio > target_ratio:
         # Wider than target: fit height, crop width
         scale = target_height / img.height
         new_width = int(scale * img.width)
-        img = img.resize((new_width, target_height), Image.LANCZOS)
+        img = resize_image(img, (new_width, target_height), preset)
         left = (new_width - target_width) // 2
         img = img.crop((left, 0, left + target_width, target_height))
     else:
         # Taller than target: fit width, crop height
         scale = target_width / img.width
         new_height = int(scale * img.height)
-        img = img.resize((target_width, new_height), Image.LANCZOS)
+        img = resize_image(img, (target_width, new_height), preset)
         top = (new_height - target_height) // 2
         img = img.crop((0, top, target_width, top + target_height))
     return img
 
 # === Load and preprocess images ===
-def load_images():
-    images = []
-    for i in range(1, len(descriptions) + 1):
-        path = os.path.join(image_folder, f"{i}.jpg")
-        if not os.path.exists(path):
-            raise ValueError(f"Image {path} not found.")
-        pil_img = Image.open(path).convert("RGB")
-        fitted_img = object_fit_cover(pil_img, TARGET_IMG_WIDTH, TARGET_IMG_HEIGHT)
-        images.append(cv2.cvtColor(np.array(fitted_img), cv2.COLOR_RGB2BGR))
-    return images
+def load_image(path):
+    if not os.path.exists(path):
+        raise ValueError(f"Image {path} not found.")
+    pil_img = open_image(path, (TARGET_IMG_WIDTH, TARGET_IMG_HEIGHT), reduced=decode_reduced)
+    fitted_img = object_fit_cover(pil_img, TARGET_IMG_WIDTH, TARGET_IMG_HEIGHT, preset=resize_preset)
+    with metrics.stage("color_convert"):
+        return cv2.cvtColor(np.array(fitted_img), cv2.COLOR_RGB2BGR)
 
 # === Add wrapped description to image (below original) ===
+# The wrapped and rasterized text panel comes from the shared text block cache.
 def add_description(img, text):
-    h, w = img.shape[:2]
+    w = img.shape[1]
     text_height = line_spacing * max_lines + text_padding
-    new_img = np.full((h + text_height, w, 3), blue_bg, dtype=np.uint8)
-    new_img[:h] = img
-
-    pil_img = Image.fromarray(new_img)
-    draw = ImageDraw.Draw(pil_img)
-    font_path = r"C:/Windows/Fonts/arial.ttf"
-    font = ImageFont.truetype(font_path, font_size)
-
     wrap_width = max(10, w // (font_size // 2))
-    lines = textwrap.wrap(text, width=wrap_width)
-    y_text = h + 5
-    for line in lines[:max_lines]:
-        w_text = draw.textlength(line, font=font)
-        draw.text(((w - w_text) // 2, y_text), line, font=font, fill=(255, 255, 255))
-        y_text += line_spacing
-
-    return np.array(pil_img)
-
-# === Compute maximum frame size based on 2x2 layout ===
+    panel = text_block(
+        text, font_path, font_size, w, line_spacing, top=5, height=text_height,
+        max_lines=max_lines, wrap_chars=wrap_width, fill=(255, 255, 255), bg=blue_bg,
+    )
+    return np.vstack([img, panel])
+
+# === Settings besides the image and text that change an annotated block ===
+def block_settings():
+    font_file = file_digest(font_path)
+    return ("diff_size_image_video", TARGET_IMG_WIDTH, TARGET_IMG_HEIGHT, decode_reduced, resize_preset,
+            font_file, font_size, line_spacing, max_lines, text_padding, blue_bg)
+
+# === Layout plan of a group, from the (height, width) of each block ===
+# Plans are cached, so a group's layout is worked out once and every hold and
+# transition frame only pastes the blocks.
+def group_plan(shapes):
+    return plan_layout(shapes, layout, layout_columns, (image_gap_x, image_gap_y), (side_padding, top_padding))
+
+# === Compute the frame size a group needs ===
 def compute_frame_size(blocks):
-    rows = [blocks[i:i + 2] for i in range(0, len(blocks), 2)]
-    max_width = 0
-    total_height = 0
-    for row in rows:
-        row_width = sum(b.shape[1] for b in row) + image_gap_x * (len(row) - 1)
-        row_height = max(b.shape[0] for b in row)
-        max_width = max(max_width, row_width)
-        total_height += row_height
-    max_width += side_padding * 2
-    total_height += image_gap_y * (len(rows) - 1) + top_padding * 2
-    return (max_width, total_height)
-
-# === Combine blocks into a frame with optional x_offset ===
-def make_frame(img_blocks, frame_size, x_offset=0):
-    canvas = np.full((frame_size[1], frame_size[0], 3), blue_bg, dtype=np.uint8)
-    y_cursor = top_padding
-    row_blocks = [img_blocks[i:i + 2] for i in range(0, len(img_blocks), 2)]
-    for row in row_blocks:
-        row_height = max(block.shape[0] for block in row)
-        x_cursor = side_padding
-        for block in row:
-            h, w = block.shape[:2]
-            x_pos = x_cursor + x_offset
-            y_pos = y_cursor + (row_height - h) // 2
-            if 0 <= x_pos < frame_size[0] and x_pos + w <= frame_size[0]:
-                canvas[y_pos:y_pos + h, x_pos:x_pos + w] = block
-            x_cursor += w + image_gap_x
-        y_cursor += row_height + image_gap_y
-    return canvas
+    return layout_size([b.shape[:2] for b in blocks])
 
-# === Slide-in animation ===
-def slide_in_animation(blocks, frame_size):
-    frames = []
-    for f in range(slide_frames):
-        progress = f / slide_frames
-        x_offset = int((1 - progress) * frame_size[0])
-        frame = make_frame(blocks, frame_size, x_offset)
-        frames.append(frame)
-    return frames
+def layout_size(shapes):
+    return group_plan(shapes).size
 
-# === Main execution ===
-def generate_video():
-    images = load_images()
-    annotated = [add_description(img, desc) for img, desc in zip(images, descriptions)]
-    groups = [annotated[i:i + 4] for i in range(0, len(annotated), 4)]
+# === Frame size fixed before any image is loaded ===
+# Every image is cropped to the target size and gets a text panel of fixed height, so
+# all blocks share one shape and the largest group is simply a full one.
+def block_shape():
+    return (TARGET_IMG_HEIGHT + line_spacing * max_lines + text_padding, TARGET_IMG_WIDTH)
 
-    frame_sizes = [compute_frame_size(g) for g in groups]
-    frame_width = max(f[0] for f in frame_sizes)
-    frame_height = max(f[1] for f in frame_sizes)
-    fixed_frame_size = (frame_width, frame_height)
+def catalogue_frame_size():
+    return layout_size([block_shape()] * min(4, len(descriptions)))
 
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video, fourcc, fps, fixed_frame_size)
+# === Combine blocks into a frame with optional x_offset ===
+# Pass `out` to render into a reused frame buffer instead of a new one.
+@metrics.timed("composite")
+def make_frame(img_blocks, frame_size, x_offset=0, out=None):
+    plate = solid_plate(frame_size, blue_bg)
+    if out is None:
+        canvas = plate.copy()
+    else:
+        canvas = out
+        np.copyto(canvas, plate)
+    group_plan([block.shape[:2] for block in img_blocks]).paste(canvas, img_blocks, x_offset)
+    return canvas
 
-    for idx, group in enumerate(groups):
-        print(f"Rendering group {idx + 1}/{len(groups)}...")
+# === Entry animation (yields frames one at a time, straight into the writer) ===
+# The group (and the previous one, if the transition shows it) is composited once;
+# every step is blended from those frames into a buffer borrowed from the frame pool.
+def transition_animation(blocks, frame_size, previous_blocks=None, pool=None):
+    # A cut has no entry frames, so there is nothing to composite
+    if transition == "cut":
+        return ()
+    pool = pool or FramePool(frame_size)
+    final_frame = make_frame(blocks, frame_size, out=pool.scratch("transition_to"))
+    previous = None
+    if TRANSITIONS[transition] and previous_blocks is not None:
+        previous = make_frame(previous_blocks, frame_size, out=pool.scratch("transition_from"))
+    return transition_frames(transition, final_frame, previous, solid_plate(frame_size, blue_bg), slide_frames, pool)
+
+# === Render consecutive groups into an encoder ===
+# Frames are rendered into a ring of buffers sized to the encoder queue. `previous` is
+# the group shown before groups[0], if any.
+def render_groups(out, groups, first_idx, total, frame_size, previous=None):
+    pool = FramePool(frame_size, encoder_queue_depth)
+    for offset, group in enumerate(groups):
+        idx = first_idx + offset
+        print(f"Rendering group {idx + 1}/{total}...")
 
         if idx == 0:
-            frame = make_frame(group, fixed_frame_size)
-            for _ in range(repeats_per_frame):
-                out.write(frame)
+            frame = make_frame(group, frame_size, out=pool.borrow())
+            out.hold(frame, seconds_per_frame)
         else:
-            anim_frames = slide_in_animation(group, fixed_frame_size)
+            anim_frames = transition_animation(group, frame_size, previous, pool)
             for f in anim_frames:
                 out.write(f)
-            final_frame = make_frame(group, fixed_frame_size)
-            for _ in range(repeats_per_frame):
-                out.write(final_frame)
+            final_frame = make_frame(group, frame_size, out=pool.borrow())
+            out.hold(final_frame, seconds_per_frame)
+        previous = group
 
-    out.release()
-    print("Video saved to:", output_video)
+# === Main execution ===
+def generate_video(workers=1):
+    check_layout(layout)
+    fixed_frame_size = catalogue_frame_size()
+    return render_video(sys.modules[__name__], fixed_frame_size, workers, fixed_frame_size)
 
 if __name__ == "__main__":
-    generate_video()
+    parser = argument_parser(sys.modules[__name__], "Render the mixed-size catalogue video.")
+    parser.add_argument("--layout", choices=LAYOUTS, default=layout, help="How a group's blocks are arranged")
+    parser.add_argument("--columns", type=int, default=layout_columns, help="Columns of the layout")
+    args = parser.parse_args()
+    apply_arguments(sys.modules[__name__], args)
+    layout = args.layout
+    layout_columns = args.columns
+    run_instrumented(args, generate_video, workers=args.workers)
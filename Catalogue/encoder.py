@@ -0,0 +1,338 @@
+# Importing required packages
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import cv2
+import numpy as np
+from instrumentation import metrics
+
+# === Encoder backends ===
+# Every backend exposes the same small API as cv2.VideoWriter plus hold():
+#   write(frame)           - append one frame (1 / fps seconds)
+#   hold(frame, duration)  - show one frame for `duration` seconds
+#   release()              - finish the file
+#   abort()                - stop after a failed render: free everything, delete the partial file
+# frames_written counts frames on the output timeline, distinct_frames counts
+# the frames that were actually handed over as new picture content.
+
+def frames_for(duration, fps):
+    return max(1, int(round(duration * fps)))
+
+# === OpenCV backend: constant frame rate, so holds are written frame by frame ===
+class OpenCVEncoder:
+    def __init__(self, path, fps, frame_size, codec='mp4v'):
+        self.path = path
+        self.fps = fps
+        self.frame_size = frame_size
+        self.frames_written = 0
+        self.distinct_frames = 0
+        fourcc = cv2.VideoWriter_fourcc(*codec)
+        self._writer = cv2.VideoWriter(path, fourcc, fps, frame_size)
+
+    def write(self, frame):
+        with metrics.stage("encode_write"):
+            self._writer.write(frame)
+        self.frames_written += 1
+        self.distinct_frames += 1
+
+    def hold(self, frame, duration):
+        n_frames = frames_for(duration, self.fps)
+        with metrics.stage("encode_write"):
+            for _ in range(n_frames):
+                self._writer.write(frame)
+        self.frames_written += n_frames
+        self.distinct_frames += 1
+
+    def release(self):
+        metrics.count("frames_written", self.frames_written)
+        metrics.count("distinct_frames", self.distinct_frames)
+        with metrics.stage("encode_release"):
+            self._writer.release()
+
+    def abort(self):
+        self._writer.release()
+        remove_partial(self.path)
+
+# === FFmpeg backend: each distinct frame is stored once with its duration ===
+# Frames are spooled losslessly (fast PNG) and described in an ffconcat list,
+# where a hold is a single entry with a long `duration`. One ffmpeg run at
+# release() encodes the list with variable-frame-rate timestamps, so encode time
+# follows the number of distinct frames rather than the length of the video.
+# Containers without VFR support (AVI) get the holds expanded inside ffmpeg.
+FFMPEG_CODECS = {'mp4v': 'mpeg4', 'XVID': 'mpeg4', 'avc1': 'libx264', 'H264': 'libx264'}
+CFR_ONLY_CONTAINERS = ('.avi',)
+
+class FFmpegEncoder:
+    def __init__(self, path, fps, frame_size, codec='avc1', ffmpeg_bin='ffmpeg', spool_dir=None, extra_args=()):
+        self.path = path
+        self.fps = fps
+        self.frame_size = frame_size
+        self.frames_written = 0
+        self.distinct_frames = 0
+        self.ffmpeg_bin = shutil.which(ffmpeg_bin)
+        if self.ffmpeg_bin is None:
+            raise RuntimeError(f"'{ffmpeg_bin}' not found on PATH; use the opencv encoder backend instead.")
+        self.vcodec = FFMPEG_CODECS.get(codec, codec)
+        self.extra_args = list(extra_args)
+        self._spool = tempfile.mkdtemp(prefix="frames_", dir=spool_dir)
+        self._entries = []  # (file name, duration in frames)
+
+    def _spool_frame(self, frame, n_frames):
+        name = f"frame_{len(self._entries):07d}.png"
+        with metrics.stage("encode_write"):
+            cv2.imwrite(os.path.join(self._spool, name), frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        self._entries.append((name, n_frames))
+        self.frames_written += n_frames
+        self.distinct_frames += 1
+
+    def write(self, frame):
+        self._spool_frame(frame, 1)
+
+    def hold(self, frame, duration):
+        self._spool_frame(frame, frames_for(duration, self.fps))
+
+    def _write_concat_list(self):
+        # Every entry is a one-frame image read at `fps`, so it always adds one frame of
+        # its own; the last entry is therefore listed with one frame less and repeated.
+        list_path = os.path.join(self._spool, "frames.ffconcat")
+        entries = list(self._entries)
+        last_name, last_frames = entries[-1]
+        if last_frames > 1:
+            entries[-1] = (last_name, last_frames - 1)
+            entries.append((last_name, None))
+        with open(list_path, "w") as f:
+            f.write("ffconcat version 1.0\n")
+            for name, n_frames in entries:
+                f.write(f"file '{name}'\noption framerate {self.fps}\n")
+                if n_frames is not None:
+                    f.write(f"duration {n_frames / self.fps:.6f}\n")
+        return list_path
+
+    def release(self):
+        metrics.count("frames_written", self.frames_written)
+        metrics.count("distinct_frames", self.distinct_frames)
+        try:
+            if not self._entries:
+                return
+            list_path = self._write_concat_list()
+            cfr = os.path.splitext(self.path)[1].lower() in CFR_ONLY_CONTAINERS
+            cmd = [
+                self.ffmpeg_bin, "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c:v", self.vcodec, "-pix_fmt", "yuv420p",
+            ]
+            if cfr:
+                cmd += ["-fps_mode", "cfr", "-r", str(self.fps), "-frames:v", str(self.frames_written)]
+            else:
+                cmd += ["-fps_mode", "vfr", "-video_track_timescale", str(self.fps * 1000)]
+            cmd += self.extra_args + [os.path.abspath(self.path)]
+            with metrics.stage("encode_release"):
+                result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed for {self.path}: {result.stderr.strip()[-2000:]}")
+        finally:
+            shutil.rmtree(self._spool, ignore_errors=True)
+
+    def abort(self):
+        shutil.rmtree(self._spool, ignore_errors=True)
+        remove_partial(self.path)
+
+# === Pipelined encoder: a dedicated thread drains a bounded frame queue ===
+# The renderer only blocks when `queue_depth` frames are already waiting (backpressure),
+# so compositing and encoding overlap; cv2/NumPy release the GIL while they work.
+# Frames handed to write()/hold() must not be modified afterwards.
+class PipelinedEncoder:
+    def __init__(self, encoder, queue_depth=8):
+        self.encoder = encoder
+        self.queue_depth = queue_depth
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._error = None
+        self._aborted = False
+        self._thread = threading.Thread(target=self._drain, name="encoder", daemon=True)
+        self._thread.start()
+
+    @property
+    def frames_written(self):
+        return self.encoder.frames_written
+
+    @property
+    def distinct_frames(self):
+        return self.encoder.distinct_frames
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            # After a failure keep draining, so the renderer never blocks on a full queue
+            if self._error is not None or self._aborted:
+                continue
+            frame, duration = item
+            try:
+                if duration is None:
+                    self.encoder.write(frame)
+                else:
+                    self.encoder.hold(frame, duration)
+            except Exception as e:
+                self._error = e
+
+    def _put(self, item):
+        if self._error is not None:
+            raise RuntimeError("Encoder thread failed") from self._error
+        with metrics.stage("encode_wait"):
+            self._queue.put(item)
+
+    def write(self, frame):
+        self._put((frame, None))
+
+    def hold(self, frame, duration):
+        self._put((frame, duration))
+
+    def release(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("Encoder thread failed") from self._error
+        self.encoder.release()
+
+    # Frames still queued are dropped; the thread is stopped before the encoder
+    def abort(self):
+        self._aborted = True
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self.encoder.abort()
+
+# === Rendition ladder: every frame is composited once and encoded at several sizes ===
+# A rendition is named by its frame height; the width keeps the master aspect ratio,
+# rounded to an even number as most codecs require. Its file sits next to the master
+# output as <name>_<height>p<ext>.
+def rendition_size(frame_size, height):
+    if height > frame_size[1]:
+        raise ValueError(f"Rendition {height}p is taller than the {frame_size[0]}x{frame_size[1]} master frame")
+    width = max(2, int(round(frame_size[0] * height / frame_size[1] / 2)) * 2)
+    return (width, height)
+
+def rendition_path(path, height):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{height}p{ext}"
+
+# Downscales each master frame into its own buffers before handing it on: exact
+# halvings first (INTER_AREA's fast 2x2 average), then one INTER_LINEAR step of at
+# most 2x, which does not alias. That is several times faster than a single
+# INTER_AREA resize to an arbitrary size. The buffers are reused, so the wrapped
+# encoder must be synchronous; pipelining goes around this one.
+class ScaledEncoder:
+    def __init__(self, encoder, source_size, frame_size):
+        self.encoder = encoder
+        self.frame_size = frame_size
+        steps = []
+        width, height = source_size
+        while width >= 2 * frame_size[0] and height >= 2 * frame_size[1]:
+            width, height = width // 2, height // 2
+            steps.append(((width, height), cv2.INTER_AREA))
+        if (width, height) != tuple(frame_size):
+            steps.append((tuple(frame_size), cv2.INTER_LINEAR))
+        self._steps = [(size, interpolation, np.empty((size[1], size[0], 3), dtype=np.uint8))
+                       for size, interpolation in steps]
+
+    @property
+    def frames_written(self):
+        return self.encoder.frames_written
+
+    @property
+    def distinct_frames(self):
+        return self.encoder.distinct_frames
+
+    def _scale(self, frame):
+        with metrics.stage("resize"):
+            for size, interpolation, buffer in self._steps:
+                frame = cv2.resize(frame, size, dst=buffer, interpolation=interpolation)
+        return frame
+
+    def write(self, frame):
+        self.encoder.write(self._scale(frame))
+
+    def hold(self, frame, duration):
+        self.encoder.hold(self._scale(frame), duration)
+
+    def release(self):
+        self.encoder.release()
+
+    def abort(self):
+        self.encoder.abort()
+
+# Feeds the same frames to the master encoder and every rendition. Holds stay holds,
+# so each distinct frame is downscaled once per rendition, not once per output frame.
+# With pipelining each rendition has its own queue and thread, and scales there.
+class MultiRenditionEncoder:
+    def __init__(self, encoders):
+        self.encoders = encoders
+
+    @property
+    def frames_written(self):
+        return self.encoders[0].frames_written
+
+    @property
+    def distinct_frames(self):
+        return self.encoders[0].distinct_frames
+
+    def write(self, frame):
+        for encoder in self.encoders:
+            encoder.write(frame)
+
+    def hold(self, frame, duration):
+        for encoder in self.encoders:
+            encoder.hold(frame, duration)
+
+    def release(self):
+        errors = []
+        for encoder in self.encoders:
+            try:
+                encoder.release()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def abort(self):
+        abort_all(self.encoders)
+
+def abort_all(encoders):
+    errors = []
+    for encoder in encoders:
+        try:
+            encoder.abort()
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+
+def remove_partial(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# === Factory used by the Catalogue scripts ===
+# renditions: extra frame heights to encode next to the master output (see rendition_path)
+ENCODER_BACKENDS = {'opencv': OpenCVEncoder, 'ffmpeg': FFmpegEncoder}
+
+def open_encoder(path, fps, frame_size, codec='mp4v', backend='opencv', queue_depth=0, renditions=(), **options):
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'. Choose from: {', '.join(ENCODER_BACKENDS)}")
+    sizes = [rendition_size(frame_size, height) for height in renditions]
+    encoders = [ENCODER_BACKENDS[backend](path, fps, frame_size, codec=codec, **options)]
+    try:
+        for height, size in zip(renditions, sizes):
+            encoder = ENCODER_BACKENDS[backend](rendition_path(path, height), fps, size, codec=codec, **options)
+            encoders.append(ScaledEncoder(encoder, frame_size, size))
+    except Exception:
+        abort_all(encoders)
+        raise
+    if queue_depth > 0:
+        encoders = [PipelinedEncoder(encoder, queue_depth) for encoder in encoders]
+    return encoders[0] if len(encoders) == 1 else MultiRenditionEncoder(encoders)
@@ -1,15 +1,21 @@
 # Importing required packages
-import cv2
-import os
-from PIL import Image, ImageDraw, ImageFont
+import sys
 import numpy as np
-import textwrap
+from block_cache import file_digest
+from frame_pool import FramePool, solid_plate
+from image_ingest import read_resized
+from instrumentation import metrics, run_instrumented
+from pipeline import apply_arguments, argument_parser, render_video
+from text_render import text_block
+from transitions import TRANSITIONS, blit_clipped, transition_frames
 
 # === Configuration ===
 image_folder = r"C:\Users\Webbies\Jupyter_Notebooks\VideoCreation_From_Image\images"
 output_video = "Animated_Video.mp4"
 image_size = (300, 400)  # Width x Height
+decode_reduced = True  # Decode JPEGs at 1/2, 1/4 or 1/8 scale when the target is much smaller
 font_size = 14
+font_path = r"C:/Windows/Fonts/arial.ttf"
 line_spacing = font_size + 5
 max_lines = 4
 text_height = line_spacing * max_lines + 5  # Adjusted to fit 4 lines
@@ -19,6 +25,17 @@ image_gap_x = 40  # Horizontal gap between images
 image_gap_y = 60  # Vertical gap between rows
 blue_bg = (90, 40, 10)
 fps = 30
+codec = 'mp4v'
+encoder_backend = "opencv"  # "opencv" or "ffmpeg" (holds stored once, variable frame rate)
+encoder_queue_depth = 0  # > 0 encodes on a separate thread with this many frames in flight
+block_cache_dir = None  # Directory that keeps annotated blocks between runs (None = rebuild every run)
+block_cache_max_bytes = 2 * 1024 ** 3  # Least recently used blocks are evicted past this size
+ingest_workers = 4  # Threads reading and decoding images ahead of use (1 = one at a time, inline)
+ingest_read_ahead = 8  # Images in flight ahead of the one being annotated (about two groups)
+segment_cache_dir = None  # Directory that keeps each group's encoded segment between runs (needs ffmpeg)
+stream_dir = None  # Directory for a progressive HLS stream (playlist.m3u8, one segment per group; needs ffmpeg)
+renditions = []  # Extra frame heights encoded from the same frames, e.g. [720, 480] (written as <name>_720p.<ext>)
+transition = "slide"  # Entry animation between groups: "cut", "slide", "push", "crossfade" or "wipe"
 
 # Calculate frame size dynamically based on gaps
 frame_width = image_size[0] * 2 + image_gap_x + 100  # plus side padding
@@ -27,8 +44,7 @@ frame_size = (frame_width, frame_height)
 
 # Timings
 seconds_per_frame = 3
-repeats_per_frame = fps * seconds_per_frame
-slide_duration = 1  # seconds for entry animation
+slide_duration = 1  # seconds for entry animation (any transition but "cut")
 slide_frames = int(fps * slide_duration)
 
 # === Input Descriptions ===
@@ -44,41 +60,34 @@ descriptions = [
 ]
 
 # === Load and Resize Images ===
-def load_images():
-    images = []
-    for i in range(1, len(descriptions) + 1):
-        path = os.path.join(image_folder, f"{i}.jpg")
-        img = cv2.imread(path)
-        if img is None:
-            raise ValueError(f"Image {path} not found or unreadable.")
-        img = cv2.resize(img, image_size)
-        images.append(img)
-    return images
+def load_image(path):
+    return read_resized(path, image_size, decode_reduced)
 
 # === Add description with word wrap ===
+# The wrapped and rasterized text panel comes from the shared text block cache.
 def add_description(img, text):
-    h = img.shape[0]
-    new_h = h + text_height
-    new_img = np.full((new_h, image_size[0], 3), blue_bg, dtype=np.uint8)
-    new_img[:h] = img
+    panel = text_block(
+        text, font_path, font_size, image_size[0], line_spacing, top=5, height=text_height,
+        max_lines=max_lines, wrap_chars=22, fill=(255, 255, 255), bg=blue_bg,
+    )
+    return np.vstack([img, panel])
 
-    pil_img = Image.fromarray(new_img)
-    draw = ImageDraw.Draw(pil_img)
-    font_path = r"C:/Windows/Fonts/arial.ttf"
-    font = ImageFont.truetype(font_path, font_size)
-
-    lines = textwrap.wrap(text, width=22)
-    y_text = h + 5
-    for line in lines[:max_lines]:  # max 4 lines now
-        w = draw.textlength(line, font=font)
-        draw.text(((image_size[0] - w) // 2, y_text), line, font=font, fill=(255, 255, 255))
-        y_text += line_spacing
-
-    return np.array(pil_img)
+# === Settings besides the image and text that change an annotated block ===
+def block_settings():
+    font_file = file_digest(font_path)
+    return ("final_animate", image_size, decode_reduced, font_file, font_size, line_spacing, max_lines, text_height, blue_bg)
 
 # === Combine up to 4 image-text blocks with optional x_offset ===
-def make_frame(img_blocks, x_offset=0):
-    canvas = np.full((frame_size[1], frame_size[0], 3), blue_bg, dtype=np.uint8)
+# Pass `out` to render into a reused frame buffer instead of a new one.
+# Empty slots simply keep the background color.
+@metrics.timed("composite")
+def make_frame(img_blocks, x_offset=0, out=None):
+    plate = solid_plate(frame_size, blue_bg)
+    if out is None:
+        canvas = plate.copy()
+    else:
+        canvas = out
+        np.copyto(canvas, plate)
 
     base_x = 50
     base_y = 30
@@ -90,59 +99,53 @@ def make_frame(img_blocks, x_offset=0):
         (base_x + block_size[0] + image_gap_x, base_y + block_size[1] + image_gap_y)  # Bottom-right
     ]
 
-    blank = np.full((block_size[1], block_size[0], 3), blue_bg, dtype=np.uint8)
-
-    for i in range(4):
-        img = img_blocks[i] if i < len(img_blocks) else blank
-        x, y = positions[i]
-        x += x_offset
-        if 0 <= x < frame_size[0]:
-            h, w = img.shape[:2]
-            if x + w <= frame_size[0]:
-                canvas[y:y + h, x:x + w] = img
+    for img, (x, y) in zip(img_blocks, positions):
+        blit_clipped(canvas, img, x + x_offset, y)
 
     return canvas
 
-# === Generate entry slide animation for a group ===
-def slide_in_animation(img_blocks):
-    frames = []
-    for f in range(slide_frames):
-        progress = f / slide_frames
-        x_offset = int((1 - progress) * frame_size[0])
-        frame = make_frame(img_blocks, x_offset)
-        frames.append(frame)
-    return frames
-
-# === Main Execution ===
-def generate_video():
-    images = load_images()
-    annotated_imgs = [add_description(img, desc) for img, desc in zip(images, descriptions)]
-    groups = [annotated_imgs[i:i + 4] for i in range(0, len(annotated_imgs), 4)]
-
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video, fourcc, fps, frame_size)
-
-    for idx, group in enumerate(groups):
-        print(f"Rendering group {idx + 1}/{len(groups)}...")
+# === Generate the entry animation for a group (lazily, one frame at a time) ===
+# The group (and the previous one, if the transition shows it) is composited once;
+# every step is blended from those frames into a buffer borrowed from the frame pool.
+def transition_animation(img_blocks, previous_blocks=None, pool=None):
+    # A cut has no entry frames, so there is nothing to composite
+    if transition == "cut":
+        return ()
+    pool = pool or FramePool(frame_size)
+    final_frame = make_frame(img_blocks, out=pool.scratch("transition_to"))
+    previous = None
+    if TRANSITIONS[transition] and previous_blocks is not None:
+        previous = make_frame(previous_blocks, out=pool.scratch("transition_from"))
+    return transition_frames(transition, final_frame, previous, solid_plate(frame_size, blue_bg), slide_frames, pool)
+
+# === Render consecutive groups into an encoder ===
+# Frames are rendered into a ring of buffers sized to the encoder queue. `previous` is
+# the group shown before groups[0], if any.
+def render_groups(out, groups, first_idx, total, previous=None):
+    pool = FramePool(frame_size, encoder_queue_depth)
+    for offset, group in enumerate(groups):
+        idx = first_idx + offset
+        print(f"Rendering group {idx + 1}/{total}...")
 
         if idx == 0:
             # First group: no animation
-            final_frame = make_frame(group, x_offset = 0)
-            for _ in range(repeats_per_frame):
-                out.write(final_frame)
+            final_frame = make_frame(group, x_offset = 0, out=pool.borrow())
+            out.hold(final_frame, seconds_per_frame)
         else:
             # Entry animation for other groups
-            slide_frames_group = slide_in_animation(group)
-            for frame in slide_frames_group:
+            for frame in transition_animation(group, previous, pool):
                 out.write(frame)
 
             # Hold frame statically after animation
-            final_frame = make_frame(group, x_offset = 0)
-            for _ in range(repeats_per_frame):
-                out.write(final_frame)
-    
-    out.release()
-    print("Video saved to:", output_video)
+            final_frame = make_frame(group, x_offset = 0, out=pool.borrow())
+            out.hold(final_frame, seconds_per_frame)
+        previous = group
+
+# === Main Execution ===
+def generate_video(workers=1):
+    return render_video(sys.modules[__name__], frame_size, workers)
 
 if __name__ == "__main__":
-    generate_video()
+    args = argument_parser(sys.modules[__name__], "Render the animated catalogue video.").parse_args()
+    apply_arguments(sys.modules[__name__], args)
+    run_instrumented(args, generate_video, workers=args.workers)
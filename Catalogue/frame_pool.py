@@ -0,0 +1,43 @@
+# Importing required packages
+import numpy as np
+
+# === Cached solid plates (read-only), one per (size, color) ===
+# Frames are reset by copying a plate instead of being filled pixel by pixel.
+plates = {}
+
+def solid_plate(size, color):
+    key = (tuple(size), tuple(color))
+    plate = plates.get(key)
+    if plate is None:
+        plate = np.full((size[1], size[0], 3), color, dtype=np.uint8)
+        plate.flags.writeable = False
+        plates[key] = plate
+    return plate
+
+# === Ring of reusable frame buffers ===
+# A frame handed to the encoder must stay untouched until the encoder is done with it.
+# A pipelined encoder holds up to queue_depth frames in its queue plus the one it is
+# encoding, so with queue_depth + 2 buffers the one borrowed next is never still in
+# flight. Synchronous encoders (queue_depth 0) are done with a frame when write()
+# returns, and two buffers suffice.
+class FramePool:
+    def __init__(self, frame_size, queue_depth=0):
+        self.shape = (frame_size[1], frame_size[0], 3)
+        self.buffers = [np.empty(self.shape, dtype=np.uint8) for _ in range(queue_depth + 2)]
+        self.next = 0
+        self._scratch = {}
+
+    # Next ring buffer; its old contents are undefined, so the caller overwrites every pixel
+    def borrow(self):
+        buffer = self.buffers[self.next]
+        self.next = (self.next + 1) % len(self.buffers)
+        return buffer
+
+    # Buffer outside the ring, kept until the next scratch() call with the same name
+    def scratch(self, name, shape=None):
+        shape = shape or self.shape
+        buffer = self._scratch.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._scratch[name] = buffer
+        return buffer
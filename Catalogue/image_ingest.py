@@ -0,0 +1,164 @@
+# Importing required packages
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import cv2
+from PIL import Image
+import numpy as np
+from instrumentation import metrics
+
+# === Decode at reduced resolution when the target is much smaller ===
+# JPEG can be decoded at 1/2, 1/4 or 1/8 scale straight from the DCT coefficients,
+# which is far cheaper than a full decode followed by a big downscale. The factor
+# is the largest one that still leaves at least the target size in both directions
+# (checked in both orientations, since EXIF rotation can swap width and height).
+REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+def reduction_factor(src_size, target_size, max_factor=8):
+    src_w, src_h = src_size
+    target_w, target_h = target_size
+    factor = 1
+    while factor < max_factor:
+        f = factor * 2
+        fits = src_w // f >= target_w and src_h // f >= target_h
+        fits_rotated = src_w // f >= target_h and src_h // f >= target_w
+        if not (fits and fits_rotated):
+            break
+        factor = f
+    return factor
+
+# Header-only probe: (format, (width, height)), or (None, None) if unreadable
+def probe_image(path):
+    try:
+        with Image.open(path) as img:
+            return img.format, img.size
+    except (OSError, ValueError):
+        return None, None
+
+# OpenCV path: BGR array (or None, like cv2.imread) at least `target_size` large
+@metrics.timed("decode")
+def read_image(path, target_size, reduced=True):
+    flags = cv2.IMREAD_COLOR
+    if reduced:
+        fmt, size = probe_image(path)
+        if fmt == "JPEG":
+            flags = REDUCED_READ_FLAGS[reduction_factor(size, target_size)]
+    return cv2.imread(path, flags)
+
+# OpenCV path, resized to exactly `size`; raises ValueError for a missing or broken file
+def read_resized(path, size, reduced=True):
+    img = read_image(path, size, reduced)
+    if img is None:
+        raise ValueError(f"Image {path} not found or unreadable.")
+    with metrics.stage("resize"):
+        return cv2.resize(img, size)
+
+# PIL path: RGB image at least `target_size` large (JPEG draft mode = DCT scaling)
+@metrics.timed("decode")
+def open_image(path, target_size, reduced=True):
+    img = Image.open(path)
+    if reduced and img.format == "JPEG":
+        img.draft("RGB", tuple(target_size))
+    return img.convert("RGB")
+
+# === Concurrent prefetching loader ===
+# Runs load(item) on a pool of `workers` threads (file reads, JPEG decode and resize
+# all release the GIL) and yields the results in input order, keeping at most
+# `read_ahead` items in flight ahead of the consumer. A failed load raises its own
+# exception as soon as it is seen, and whatever is still queued is cancelled. With
+# workers <= 1 items are loaded inline, one at a time.
+def prefetch(load, items, workers=4, read_ahead=8):
+    if workers <= 1:
+        yield from map(load, items)
+        return
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        try:
+            pending.extend(pool.submit(load, item) for item in islice(items, max(read_ahead, 1)))
+            while pending:
+                for future in pending:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
+                result = pending.popleft().result()
+                pending.extend(pool.submit(load, item) for item in islice(items, 1))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+# Fail before any work starts when an input file is missing
+def check_files(paths):
+    for path in paths:
+        if not os.path.isfile(path):
+            raise ValueError(f"Image {path} not found.")
+
+# === Resize backends and quality/speed presets ===
+# quality  - PIL Lanczos (the original behavior)
+# balanced - OpenCV area averaging: sharp enough for downscaling, several times faster
+# fast     - OpenCV bilinear: fastest; fine after a reduced decode, aliases on big shrinks
+RESIZE_PRESETS = {
+    "quality": ("pil", Image.LANCZOS),
+    "balanced": ("opencv", cv2.INTER_AREA),
+    "fast": ("opencv", cv2.INTER_LINEAR),
+}
+
+@metrics.timed("resize")
+def resize_image(img: Image.Image, size, preset="quality") -> Image.Image:
+    if preset not in RESIZE_PRESETS:
+        raise ValueError(f"Unknown resize preset '{preset}'. Choose from: {', '.join(RESIZE_PRESETS)}")
+    backend, method = RESIZE_PRESETS[preset]
+    if backend == "pil":
+        return img.resize(size, method)
+    return Image.fromarray(cv2.resize(np.asarray(img), size, interpolation=method))
+
+# === Measure decode/resize speed and quality on a folder of images ===
+# The reference is a full decode + PIL Lanczos; quality is PSNR against it (higher is better).
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return float("inf") if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+
+def measure(folder, target_size, fit):
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+    if not paths:
+        raise ValueError(f"No images found in {folder}")
+
+    reference = {path: np.asarray(fit(open_image(path, target_size, reduced=False), "quality")) for path in paths}
+    results = []
+    for reduced in (False, True):
+        for preset in RESIZE_PRESETS:
+            start = time.perf_counter()
+            outputs = {path: np.asarray(fit(open_image(path, target_size, reduced), preset)) for path in paths}
+            elapsed = time.perf_counter() - start
+            results.append({
+                "reduced_decode": reduced,
+                "preset": preset,
+                "ms_per_image": round(1000 * elapsed / len(paths), 2),
+                "psnr_db": round(min(psnr(outputs[p], reference[p]) for p in paths), 2),
+            })
+    return results
+
+if __name__ == "__main__":
+    from diff_size_image_video import object_fit_cover
+
+    parser = argparse.ArgumentParser(description="Compare decode and resize presets on a folder of images.")
+    parser.add_argument("folder")
+    parser.add_argument("--size", default="300x400", help="Target WIDTHxHEIGHT (default 300x400)")
+    args = parser.parse_args()
+    target = tuple(int(v) for v in args.size.lower().split("x"))
+
+    fit = lambda img, preset: object_fit_cover(img, target[0], target[1], preset=preset)
+    for row in measure(args.folder, target, fit):
+        print(f"reduced_decode={row['reduced_decode']!s:5}  preset={row['preset']:8}  "
+              f"{row['ms_per_image']:8.2f} ms/image  worst PSNR {row['psnr_db']} dB")
@@ -0,0 +1,208 @@
+# Importing required packages
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# === Per-stage timers and counters for a render ===
+# Stages used by the renderers:
+#   decode, resize, text_raster            - getting items ready ("input")
+#   composite, color_convert, transition_*, panel_redraw - building frames ("compositing")
+#   encode_write, encode_wait, encode_release, concat, segment_publish - writing the video ("encoding")
+# encode_wait is time the renderer spent blocked on a full encoder queue; with a
+# pipelined encoder encode_write runs on its own thread, so shares can add up to more
+# than 1. Counters hold frames_written and distinct_frames. Samples hold individual
+# durations in seconds whose spread matters, such as the live renderer's
+# event_to_screen latency. Worker processes send what they measured back with their
+# results (snapshot() there, merge() here), so with --workers the stages add up the
+# time spent in every process.
+STAGE_GROUPS = {
+    "input": ("decode", "resize", "text_raster"),
+    "compositing": ("composite", "color_convert", "transition_slide", "transition_push",
+                    "transition_crossfade", "transition_wipe", "panel_redraw"),
+    "encoding": ("encode_write", "encode_wait", "encode_release", "concat", "segment_publish"),
+}
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    # With trace=True every stage call is also kept as a Chrome trace event
+    def reset(self, trace=False):
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+            self.samples = {}
+            self.trace = trace
+            self.events = []
+            self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                timer = self.timers.get(name)
+                if timer is None:
+                    self.timers[name] = [1, end - start]
+                else:
+                    timer[0] += 1
+                    timer[1] += end - start
+                if self.trace:
+                    self.events.append((name, start, end, os.getpid(), threading.get_ident()))
+
+    # Decorator form of stage()
+    def timed(self, name):
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def sample_summary(self, name):
+        values = sorted(self.samples.get(name, ()))
+        if not values:
+            return None
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        return {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 4),
+            "p50": round(pick(0.5), 4),
+            "p95": round(pick(0.95), 4),
+            "max": round(values[-1], 4),
+        }
+
+    # Raw timers, counters, samples and trace events, e.g. to hand back from a worker process
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timers": {name: list(timer) for name, timer in self.timers.items()},
+                "counters": dict(self.counters),
+                "samples": {name: list(values) for name, values in self.samples.items()},
+                "events": list(self.events),
+            }
+
+    # Add a snapshot taken in another process to these metrics
+    def merge(self, snapshot):
+        with self._lock:
+            for name, (calls, seconds) in snapshot["timers"].items():
+                timer = self.timers.setdefault(name, [0, 0.0])
+                timer[0] += calls
+                timer[1] += seconds
+            for name, n in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            for name, values in snapshot["samples"].items():
+                self.samples.setdefault(name, []).extend(values)
+            if self.trace:
+                self.events.extend(snapshot["events"])
+
+    def summary(self):
+        wall = time.perf_counter() - self.started
+        stages = {
+            name: {
+                "calls": calls,
+                "seconds": round(seconds, 4),
+                "share": round(seconds / wall, 3) if wall > 0 else None,
+            }
+            for name, (calls, seconds) in sorted(self.timers.items(), key=lambda item: -item[1][1])
+        }
+        groups = {
+            group: round(sum(self.timers.get(name, (0, 0.0))[1] for name in names), 4)
+            for group, names in STAGE_GROUPS.items()
+        }
+        return {
+            "wall_seconds": round(wall, 3),
+            "bound_by": max(groups, key=groups.get) if any(groups.values()) else None,
+            "groups": groups,
+            "stages": stages,
+            "counters": dict(self.counters),
+            "samples": {name: self.sample_summary(name) for name in sorted(self.samples)},
+        }
+
+    # Chrome trace format (chrome://tracing, Perfetto): one complete event per stage call
+    def chrome_trace(self):
+        threads = {}
+        events = []
+        for name, start, end, pid, thread in self.events:
+            events.append({
+                "name": name,
+                "ph": "X",
+                "ts": round((start - self.started) * 1e6, 1),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": pid,
+                "tid": threads.setdefault((pid, thread), len(threads)),
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+# Process-wide metrics shared by every module
+metrics = Metrics()
+
+# === cProfile results as rows, hottest (cumulative time) first ===
+def profile_rows(profiler, limit=25):
+    rows = []
+    for (filename, line, func), (_, calls, own, cumulative, _) in pstats.Stats(profiler).stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({func})",
+            "calls": calls,
+            "own_seconds": round(own, 4),
+            "cumulative_seconds": round(cumulative, 4),
+        })
+    rows.sort(key=lambda row: -row["cumulative_seconds"])
+    return rows[:limit]
+
+def print_summary(summary):
+    print(f"Render stages ({summary['wall_seconds']}s wall, bound by {summary['bound_by']}):")
+    for name, stage in summary["stages"].items():
+        print(f"  {name:15} {stage['calls']:8} calls {stage['seconds']:9.3f}s {stage['share']:7.1%}")
+    for name, value in summary["counters"].items():
+        print(f"  {name:15} {value:8}")
+    for name, stats in summary["samples"].items():
+        print(f"  {name:15} {stats['count']:8} samples, p50 {stats['p50'] * 1000:.1f} ms, "
+              f"p95 {stats['p95'] * 1000:.1f} ms, max {stats['max'] * 1000:.1f} ms")
+
+# === Command-line hooks shared by the scripts ===
+def add_instrumentation_arguments(parser):
+    parser.add_argument("--metrics", help="Write per-stage timings and counters to this JSON file")
+    parser.add_argument("--trace", help="Write every stage call to this file as a Chrome trace (chrome://tracing, Perfetto)")
+    parser.add_argument("--profile", action="store_true", help="Run under cProfile and add the hottest functions to the metrics")
+
+def run_instrumented(args, func, *func_args, **func_kwargs):
+    metrics.reset(trace=args.trace is not None)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        result = func(*func_args, **func_kwargs)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+
+    summary = metrics.summary()
+    if profiler is not None:
+        summary["profile"] = profile_rows(profiler)
+    print_summary(summary)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.trace:
+        with open(args.trace, "w", encoding="utf-8") as f:
+            json.dump(metrics.chrome_trace(), f)
+    return result
@@ -0,0 +1,100 @@
+# === Layout plans for a group of blocks, computed once and reused for every frame ===
+# A plan places blocks of given (height, width) shapes: the top-left corner of every
+# block and the size of the laid-out frame, padding included. The blits for a frame
+# of a given size and x offset (destination and source slices, clipped to the frame
+# edges) are worked out on first use and kept, so pasting a group is one slice copy
+# per block. Plans are cached by shapes and layout settings; when every block has the
+# same shape, one plan serves every full group of the catalogue.
+#
+# Layouts:
+#   "grid"    - rows of `columns` blocks; a row is as tall as its tallest block and
+#               shorter blocks are centered vertically in it
+#   "masonry" - `columns` columns as wide as the widest block; each block goes to the
+#               shortest column so far, top-aligned and centered horizontally
+LAYOUTS = ("grid", "masonry")
+MAX_CACHED_PLANS = 256
+MAX_CACHED_BLITS = 64  # (frame size, x offset) pairs kept per plan
+
+plans = {}
+
+def check_layout(name):
+    if name not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{name}'. Choose from: {', '.join(LAYOUTS)}")
+    return name
+
+# Destination and source slices of a block placed at (x, y), clipped to the canvas
+def clip_blit(canvas_size, shape, x, y):
+    canvas_w, canvas_h = canvas_size
+    h, w = shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, canvas_w), min(y + h, canvas_h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (slice(y0, y1), slice(x0, x1)), (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+
+class LayoutPlan:
+    def __init__(self, shapes, positions, size):
+        self.shapes = shapes
+        self.positions = positions
+        self.size = size
+        self._blits = {}
+
+    def blits(self, frame_size, x_offset=0):
+        key = (tuple(frame_size), x_offset)
+        blits = self._blits.get(key)
+        if blits is None:
+            blits = [clip_blit(frame_size, shape, x + x_offset, y) for shape, (x, y) in zip(self.shapes, self.positions)]
+            if len(self._blits) >= MAX_CACHED_BLITS:
+                self._blits.clear()
+            self._blits[key] = blits
+        return blits
+
+    def paste(self, canvas, blocks, x_offset=0):
+        for block, blit in zip(blocks, self.blits((canvas.shape[1], canvas.shape[0]), x_offset)):
+            if blit is not None:
+                dst, src = blit
+                canvas[dst] = block[src]
+
+def grid_positions(shapes, columns, gap, padding):
+    positions = []
+    content_width = 0
+    y = padding[1]
+    for start in range(0, len(shapes), columns):
+        row = shapes[start:start + columns]
+        row_height = max(h for h, _ in row)
+        x = padding[0]
+        for h, w in row:
+            positions.append((x, y + (row_height - h) // 2))
+            x += w + gap[0]
+        content_width = max(content_width, x - gap[0] - padding[0])
+        y += row_height + gap[1]
+    content_height = y - gap[1] - padding[1] if shapes else 0
+    return positions, (content_width, content_height)
+
+def masonry_positions(shapes, columns, gap, padding):
+    column_width = max((w for _, w in shapes), default=0)
+    column_heights = [0] * columns
+    positions = []
+    for h, w in shapes:
+        column = column_heights.index(min(column_heights))
+        positions.append((padding[0] + column * (column_width + gap[0]) + (column_width - w) // 2,
+                          padding[1] + column_heights[column]))
+        column_heights[column] += h + gap[1]
+    used = min(columns, len(shapes))
+    content_width = used * column_width + gap[0] * max(used - 1, 0)
+    content_height = max(max(column_heights) - gap[1], 0)
+    return positions, (content_width, content_height)
+
+# gap and padding are (x, y) pairs; padding is added on both sides
+def plan_layout(shapes, layout="grid", columns=2, gap=(0, 0), padding=(0, 0)):
+    shapes = tuple((int(h), int(w)) for h, w in shapes)
+    key = (shapes, layout, columns, tuple(gap), tuple(padding))
+    plan = plans.get(key)
+    if plan is None:
+        place = masonry_positions if check_layout(layout) == "masonry" else grid_positions
+        positions, (content_width, content_height) = place(shapes, columns, gap, padding)
+        plan = LayoutPlan(shapes, positions, (content_width + 2 * padding[0], content_height + 2 * padding[1]))
+        if len(plans) >= MAX_CACHED_PLANS:
+            plans.clear()
+        plans[key] = plan
+    return plan
@@ -1,18 +1,36 @@
 # Importing required packages
-import cv2
-import os
-from PIL import Image, ImageDraw, ImageFont
+import sys
 import numpy as np
+from block_cache import file_digest
+from frame_pool import FramePool, solid_plate
+from image_ingest import read_resized
+from instrumentation import metrics, run_instrumented
+from pipeline import apply_arguments, argument_parser, render_video
+from text_render import text_block
+from transitions import TRANSITIONS, transition_frames
 
 # === Configuration ===
 image_folder = r"C:\Users\Webbies\Jupyter_Notebooks\VideoCreation_From_Image\images"
 output_video = "auction_showcase_11.avi"
 image_size = (300, 400)  # Width x Height for each image
+decode_reduced = True  # Decode JPEGs at 1/2, 1/4 or 1/8 scale when the target is much smaller
 font_size = 18
+font_path = r"C:/Windows/Fonts/arial.ttf"
 fps = 30
 codec = 'XVID'
+encoder_backend = "opencv"  # "opencv" or "ffmpeg" (holds stored once, variable frame rate)
+encoder_queue_depth = 0  # > 0 encodes on a separate thread with this many frames in flight
+block_cache_dir = None  # Directory that keeps annotated blocks between runs (None = rebuild every run)
+block_cache_max_bytes = 2 * 1024 ** 3  # Least recently used blocks are evicted past this size
+ingest_workers = 4  # Threads reading and decoding images ahead of use (1 = one at a time, inline)
+ingest_read_ahead = 8  # Images in flight ahead of the one being annotated (about two groups)
+segment_cache_dir = None  # Directory that keeps each group's encoded segment between runs (needs ffmpeg)
+stream_dir = None  # Directory for a progressive HLS stream (playlist.m3u8, one segment per group; needs ffmpeg)
+renditions = []  # Extra frame heights encoded from the same frames, e.g. [720, 480] (written as <name>_720p.<ext>)
+transition = "cut"  # Entry animation between groups: "cut", "slide", "push", "crossfade" or "wipe"
 seconds_per_frame = 3
-repeats_per_frame = fps * seconds_per_frame
+slide_duration = 1  # seconds for entry animation (any transition but "cut")
+slide_frames = int(fps * slide_duration)
 blue_bg = (90, 40, 10)
 
 # Gap configuration between images
@@ -38,65 +56,34 @@ descriptions = [
 ]
 
 # === Load and Resize Images ===
-def load_images():
-    images = []
-    for i in range(1, 9):
-        path = os.path.join(image_folder, f"{i}.jpg")
-        img = cv2.imread(path)
-        if img is None:
-            raise ValueError(f"Image {path} not found or unreadable.")
-        img = cv2.resize(img, image_size)
-        images.append(img)
-    return images
+def load_image(path):
+    return read_resized(path, image_size, decode_reduced)
 
 # === Add description below each image, with auto line wrap ===
+# The wrapped and rasterized text panel comes from the shared text block cache.
 def add_description(img, text):
-    font_path = r"C:/Windows/Fonts/arial.ttf"
-    font = ImageFont.truetype(font_path, font_size)
-
-    max_width = image_size[0] - 20  # Allow some padding
-    lines = []
-    words = text.split()
-    line = ""
-
-    dummy_img = Image.new("RGB", (1, 1))
-    draw = ImageDraw.Draw(dummy_img)
-
-    for word in words:
-        test_line = line + " " + word if line else word
-        bbox = draw.textbbox((0, 0), test_line, font=font)
-        w = bbox[2] - bbox[0]
-        if w <= max_width:
-            line = test_line
-        else:
-            lines.append(line)
-            line = word
-    if line:
-        lines.append(line)
-
-    h = img.shape[0]
-    line_height = font_size + 8
-    total_text_height = len(lines) * line_height + 20
-    new_h = h + total_text_height
-
-    new_img = np.full((new_h, image_size[0], 3), blue_bg, dtype=np.uint8)
-    new_img[:h] = img
-
-    pil_img = Image.fromarray(new_img)
-    draw = ImageDraw.Draw(pil_img)
-
-    for i, line in enumerate(lines):
-        bbox = draw.textbbox((0, 0), line, font=font)
-        w = bbox[2] - bbox[0]
-        x = (image_size[0] - w) // 2
-        y = h + 10 + i * line_height
-        draw.text((x, y), line, fill=(255, 255, 255), font=font)
-
-    return np.array(pil_img)
+    panel = text_block(
+        text, font_path, font_size, image_size[0], line_height=font_size + 8, top=10,
+        wrap_width=image_size[0] - 20,  # Allow some padding
+        center_by="ink", fill=(255, 255, 255), bg=blue_bg,
+    )
+    return np.vstack([img, panel])
+
+# === Settings besides the image and text that change an annotated block ===
+def block_settings():
+    font_file = file_digest(font_path)
+    return ("normal_video", image_size, decode_reduced, font_file, font_size, blue_bg)
 
 # === Combine 4 image-text blocks into a frame ===
-def make_frame(img_blocks):
-    canvas = np.full((frame_size[1], frame_size[0], 3), blue_bg, dtype=np.uint8)
+# Pass `out` to render into a reused frame buffer instead of a new one.
+@metrics.timed("composite")
+def make_frame(img_blocks, out=None):
+    plate = solid_plate(frame_size, blue_bg)
+    if out is None:
+        canvas = plate.copy()
+    else:
+        canvas = out
+        np.copyto(canvas, plate)
 
     # Calculate positions with spacing
     x0, y0 = 50, 50  # Starting offset from top-left
@@ -113,23 +100,38 @@ def make_frame(img_blocks):
 
     return canvas
 
-# === Main Execution ===
-def generate_video():
-    images = load_images()
-    annotated_imgs = [add_description(img, desc) for img, desc in zip(images, descriptions)]
-
-    four_per_frame = [annotated_imgs[i:i+4] for i in range(0, len(annotated_imgs), 4)]
+# === Entry animation for a group (none with the default "cut") ===
+# The group (and the previous one, if the transition shows it) is composited once;
+# every step is blended from those frames into a buffer borrowed from the frame pool.
+def transition_animation(img_blocks, previous_blocks=None, pool=None):
+    # A cut has no entry frames, so there is nothing to composite
+    if transition == "cut":
+        return ()
+    pool = pool or FramePool(frame_size)
+    final_frame = make_frame(img_blocks, out=pool.scratch("transition_to"))
+    previous = None
+    if TRANSITIONS[transition] and previous_blocks is not None:
+        previous = make_frame(previous_blocks, out=pool.scratch("transition_from"))
+    return transition_frames(transition, final_frame, previous, solid_plate(frame_size, blue_bg), slide_frames, pool)
+
+# === Render consecutive groups into an encoder ===
+# Frames are rendered into a ring of buffers sized to the encoder queue. `previous` is
+# the group shown before groups[0], if any.
+def render_groups(out, groups, first_idx, total, previous=None):
+    pool = FramePool(frame_size, encoder_queue_depth)
+    for offset, group in enumerate(groups):
+        if first_idx + offset > 0:
+            for frame in transition_animation(group, previous, pool):
+                out.write(frame)
+        frame = make_frame(group, out=pool.borrow())
+        out.hold(frame, seconds_per_frame)
+        previous = group
 
-    fourcc = cv2.VideoWriter_fourcc(*codec)
-    out = cv2.VideoWriter(output_video, fourcc, fps, frame_size)
-
-    for group in four_per_frame:
-        frame = make_frame(group)
-        for _ in range(repeats_per_frame):
-            out.write(frame)
-
-    out.release()
-    print("Video saved to:", output_video)
+# === Main Execution ===
+def generate_video(workers=1):
+    return render_video(sys.modules[__name__], frame_size, workers)
 
 if __name__ == "__main__":
-    generate_video()
+    args = argument_parser(sys.modules[__name__], "Render the static catalogue video.").parse_args()
+    apply_arguments(sys.modules[__name__], args)
+    run_instrumented(args, generate_video, workers=args.workers)
@@ -0,0 +1,179 @@
+# Importing required packages
+import argparse
+import importlib
+import math
+import os
+from functools import partial
+from itertools import islice
+from block_cache import file_digest, get_block_cache, lookup_block
+from encoder import open_encoder
+from image_ingest import check_files, prefetch
+from instrumentation import add_instrumentation_arguments
+from segments import render_in_parallel, render_incremental, render_progressive
+from transitions import TRANSITIONS, check_transition
+
+# === Render pipeline shared by the catalogue scripts ===
+# A script keeps its settings as module globals (batch_render and the command line
+# change them there) and supplies the parts that decide how its catalogue looks:
+#   load_image(path)            - the decoded, resized BGR image
+#   add_description(img, text)  - the image with its text panel: a "block"
+#   block_settings()            - everything besides the image and text that shapes a block
+#   render_groups(out, groups, first_idx, total, *frame_args, previous=None)
+#                               - the frames of consecutive groups, into an encoder
+# Everything here takes the script module and reads its settings when called.
+
+# Script settings that change a group's encoded segment, where the script has them.
+# Files named by SEGMENT_FILES also count with their contents.
+SEGMENT_SETTINGS = (
+    "fps", "codec", "encoder_backend", "seconds_per_frame", "slide_frames", "transition",
+    "frame_size", "image_size", "block_size", "image_gap_x", "image_gap_y", "side_padding", "top_padding",
+    "blue_bg", "bg_image_path", "layout", "layout_columns",
+)
+SEGMENT_FILES = ("bg_image_path",)
+
+# Segment workers get these settings from the parent. A worker started with spawn or
+# forkserver imports the script afresh, so anything changed by the command line or a
+# batch job would otherwise fall back to the script's defaults there.
+WORKER_SETTINGS = SEGMENT_SETTINGS + ("encoder_queue_depth", "renditions")
+
+def script_name(script):
+    return os.path.splitext(os.path.basename(script.__file__))[0]
+
+# === Catalogue items ===
+# Paths of the catalogue images, in order (1.jpg ... N.jpg)
+def image_paths(script):
+    return [os.path.join(script.image_folder, f"{i}.jpg") for i in range(1, len(script.descriptions) + 1)]
+
+def load_images(script):
+    paths = image_paths(script)
+    check_files(paths)
+    return list(prefetch(script.load_image, paths, script.ingest_workers, script.ingest_read_ahead))
+
+# === Annotated blocks, reused from the on-disk block cache when enabled ===
+# A block's key covers the image bytes, its description and every setting that
+# changes its pixels, so editing one item only rebuilds that one block.
+# Blocks are produced in catalogue order as they are consumed: images (or cached
+# blocks) are read ahead on the ingest threads, text panels are added here. Missing
+# files are only found as they are reached; render_video checks them all up front.
+def iter_blocks(script):
+    paths = image_paths(script)
+    if script.block_cache_dir is None:
+        images = prefetch(script.load_image, paths, script.ingest_workers, script.ingest_read_ahead)
+        for img, desc in zip(images, script.descriptions):
+            yield script.add_description(img, desc)
+        return
+
+    cache = get_block_cache(script.block_cache_dir, script.block_cache_max_bytes)
+    settings = script.block_settings()
+    lookup = lambda item: lookup_block(cache, item[0], settings, item[1], script.load_image)
+    items = prefetch(lookup, zip(paths, script.descriptions), script.ingest_workers, script.ingest_read_ahead)
+    for (key, block, img), desc in zip(items, script.descriptions):
+        if block is None:
+            block = script.add_description(img, desc)
+            cache.put(key, block)
+        yield block
+    print("Block cache:", cache.stats())
+
+# === Groups of 4 blocks, loaded as they are consumed ===
+def iter_groups(script):
+    blocks = iter_blocks(script)
+    while True:
+        group = list(islice(blocks, 4))
+        if not group:
+            return
+        yield group
+
+# === Segments ===
+def script_settings(script, names):
+    return {name: getattr(script, name) for name in names if hasattr(script, name)}
+
+def segment_settings(script):
+    return script_settings(script, SEGMENT_SETTINGS)
+
+# Everything besides the blocks that changes a group's encoded segment
+def segment_key_settings(script):
+    settings = segment_settings(script)
+    files = {name: file_digest(settings[name]) for name in SEGMENT_FILES if name in settings}
+    return (script_name(script), sorted(settings.items()), sorted(files.items()))
+
+def open_output(script, path, frame_size):
+    return open_encoder(path, script.fps, frame_size, codec=script.codec, backend=script.encoder_backend,
+                        queue_depth=script.encoder_queue_depth, renditions=script.renditions)
+
+# Render groups into a new output file. If rendering or encoding fails, the encoder
+# is stopped (its thread joined, spooled frames deleted) and the partial output and
+# rendition files are removed before the error is raised.
+def encode_groups(script, path, frame_size, groups, first_idx, total, *frame_args, previous=None):
+    out = open_output(script, path, frame_size)
+    try:
+        script.render_groups(out, groups, first_idx, total, *frame_args, previous=previous)
+        out.release()
+    except BaseException:
+        out.abort()
+        raise
+    return out.frames_written
+
+# Encode a run of groups into its own segment file (worker process entry point).
+# `module` is the name the script module is imported under; `settings` (see
+# WORKER_SETTINGS) are applied to it first.
+def render_segment(module, settings, path, groups, first_idx, total, frame_size, *frame_args, previous=None):
+    script = importlib.import_module(module)
+    for name, value in settings.items():
+        setattr(script, name, value)
+    return path, encode_groups(script, path, frame_size, groups, first_idx, total, *frame_args, previous=previous)
+
+# === Main Execution ===
+# frame_args are handed to the script's render_groups after `total`.
+def render_video(script, frame_size, workers=1, *frame_args):
+    check_transition(script.transition)
+    # Fail before any output file is created when an image is missing
+    check_files(image_paths(script))
+    with_previous = TRANSITIONS[script.transition]
+    # Groups are loaded as they are taken, so only the groups being rendered are in memory
+    groups = iter_groups(script)
+    n_groups = math.ceil(len(script.descriptions) / 4)
+    segment = partial(render_segment, script.__name__, script_settings(script, WORKER_SETTINGS))
+    segment_args = (frame_size, *frame_args)
+
+    if script.stream_dir is not None:
+        # Each group is published to the stream as soon as it (and every group before it) is encoded
+        frames_written = render_progressive(segment, groups, script.output_video, script.stream_dir, script.fps,
+                                            script.seconds_per_frame + script.slide_duration, workers, *segment_args,
+                                            with_previous=with_previous, renditions=script.renditions, codec=script.codec,
+                                            total=n_groups)
+    elif script.segment_cache_dir is not None:
+        # Unchanged groups are copied from the segment cache; only edited ones are rendered
+        frames_written = render_incremental(segment, groups, script.output_video, script.segment_cache_dir,
+                                            segment_key_settings(script), workers, *segment_args,
+                                            with_previous=with_previous, renditions=script.renditions, total=n_groups)
+    elif workers > 1:
+        # Groups are encoded as segments in parallel and joined without re-encoding
+        frames_written = render_in_parallel(segment, groups, script.output_video, workers, *segment_args,
+                                            with_previous=with_previous, renditions=script.renditions, total=n_groups)
+    else:
+        frames_written = encode_groups(script, script.output_video, frame_size, groups, 0, n_groups, *frame_args)
+    print("Video saved to:", script.output_video)
+    return frames_written
+
+# === Command line shared by the scripts ===
+def argument_parser(script, description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--workers", type=int, default=1, help="Render groups in N processes (joining segments needs ffmpeg)")
+    parser.add_argument("--queue-depth", type=int, default=script.encoder_queue_depth, help="Frames buffered for the encoder thread (0 = encode inline)")
+    parser.add_argument("--block-cache", default=script.block_cache_dir, help="Keep annotated blocks in this directory and reuse them on later runs")
+    parser.add_argument("--ingest-workers", type=int, default=script.ingest_workers, help="Threads reading and decoding images ahead of use")
+    parser.add_argument("--segment-cache", default=script.segment_cache_dir, help="Keep each group's encoded segment in this directory and re-render only changed groups")
+    parser.add_argument("--stream-dir", default=script.stream_dir, help="Also publish an HLS stream here that grows as groups finish (playlist.m3u8)")
+    parser.add_argument("--transition", choices=list(TRANSITIONS), default=script.transition, help="Entry animation between groups")
+    parser.add_argument("--renditions", type=int, nargs="+", default=script.renditions, help="Also encode these frame heights (e.g. 720 480) from the same frames")
+    add_instrumentation_arguments(parser)
+    return parser
+
+def apply_arguments(script, args):
+    script.encoder_queue_depth = args.queue_depth
+    script.block_cache_dir = args.block_cache
+    script.ingest_workers = args.ingest_workers
+    script.segment_cache_dir = args.segment_cache
+    script.stream_dir = args.stream_dir
+    script.transition = args.transition
+    script.renditions = args.renditions
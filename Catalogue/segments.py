@@ -0,0 +1,363 @@
+# Importing required packages
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from encoder import FFMPEG_CODECS, rendition_path
+from instrumentation import metrics
+
+# === Locate ffmpeg (needed to join segments without re-encoding) ===
+def require_ffmpeg(ffmpeg_bin='ffmpeg'):
+    path = shutil.which(ffmpeg_bin)
+    if path is None:
+        raise RuntimeError(f"'{ffmpeg_bin}' not found on PATH; it is needed to join video segments.")
+    return path
+
+# === Join encoded segments in order with a stream copy ===
+@metrics.timed("concat")
+def concat_segments(segment_paths, output_path, ffmpeg_bin='ffmpeg'):
+    ffmpeg = require_ffmpeg(ffmpeg_bin)
+    fd, list_path = tempfile.mkstemp(suffix=".ffconcat", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("ffconcat version 1.0\n")
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        cmd = [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+               "-i", list_path, "-c", "copy", os.path.abspath(output_path)]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg concat failed for {output_path}: {result.stderr.strip()[-2000:]}")
+    finally:
+        os.remove(list_path)
+
+# Join the master segments and, per rendition height, the matching rendition files.
+# If any join fails, none of the outputs is left behind.
+def concat_renditions(segment_paths, output_path, renditions=()):
+    try:
+        concat_segments(segment_paths, output_path)
+        for height in renditions:
+            concat_segments([rendition_path(path, height) for path in segment_paths], rendition_path(output_path, height))
+    except BaseException:
+        remove_files([output_path] + [rendition_path(output_path, height) for height in renditions])
+        raise
+
+def remove_files(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+# Keyword arguments that hand render_segment the group shown before its first one, when it needs it
+def previous_kwargs(previous, with_previous):
+    return {"previous": previous} if with_previous else {}
+
+# Worker side of run_segments: the job's result plus the metrics recorded for it
+def measured_segment(render_segment, trace, *args, **kwargs):
+    metrics.reset(trace=trace)
+    result = render_segment(*args, **kwargs)
+    return result, metrics.snapshot()
+
+# Run render_segment for every (args, kwargs) job, yielding (path, frames) in job order.
+# `jobs` is only advanced as work is handed out and at most workers * 2 jobs wait on the
+# pool at once, so a lazy job list keeps just the groups in flight in memory. With
+# workers <= 1 every job is rendered inline. Stage timings and counters of the worker
+# processes are merged into this process's metrics. When a job (or taking the next one)
+# fails, jobs that have not started are cancelled and running ones are waited for, so
+# no worker writes into the segment directory after the error is raised.
+def run_segments(render_segment, jobs, workers):
+    if workers <= 1:
+        for args, kwargs in jobs:
+            yield render_segment(*args, **kwargs)
+        return
+
+    def collect(future):
+        result, snapshot = future.result()
+        metrics.merge(snapshot)
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for args, kwargs in jobs:
+                pending.append(pool.submit(measured_segment, render_segment, metrics.trace, *args, **kwargs))
+                if len(pending) >= workers * 2:
+                    yield collect(pending.popleft())
+            while pending:
+                yield collect(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+
+# === Render consecutive runs of groups in worker processes ===
+# render_segment(path, groups, first_idx, total, *extra_args) must be a module-level
+# function that encodes `groups` into `path` and returns (path, frames_written). Runs
+# are contiguous and joined in group order, so the frame sequence matches the serial
+# render. With with_previous=True, render_segment also gets previous=<the group before
+# the run> (None for the first run), for transitions that show the outgoing group.
+# With renditions, every segment also has a rendition file per height next to it (see
+# encoder.rendition_path), and each rendition is joined the same way.
+# `groups` can be any iterable, e.g. a generator that loads each group as it is taken;
+# pass its length as `total` when it has no len(). Runs are capped at max_chunk groups
+# so that the runs waiting on the pool (see run_segments) stay small for long catalogues.
+# Returns the total number of frames written.
+def render_in_parallel(render_segment, groups, output_path, workers, *extra_args, chunks_per_worker=4, max_chunk=8,
+                       with_previous=False, renditions=(), total=None):
+    require_ffmpeg()
+    total = len(groups) if total is None else total
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    ext = os.path.splitext(output_path)[1]
+    segment_dir = tempfile.mkdtemp(prefix="segments_", dir=out_dir)
+    chunk = max(1, min(max_chunk, math.ceil(total / (workers * chunks_per_worker))))
+
+    def jobs():
+        remaining = iter(groups)
+        start = 0
+        previous = None
+        while True:
+            run = list(islice(remaining, chunk))
+            if not run:
+                return
+            path = os.path.join(segment_dir, f"segment_{start:06d}{ext}")
+            yield (path, run, start, total, *extra_args), previous_kwargs(previous, with_previous)
+            start += len(run)
+            previous = run[-1]
+
+    try:
+        results = list(run_segments(render_segment, jobs(), workers))
+        concat_renditions([path for path, _ in results], output_path, renditions)
+        return sum(frames for _, frames in results)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+# === Progressive output: an HLS stream that grows as groups finish ===
+# Every group is rendered as its own segment (render_segment as in render_in_parallel)
+# and, as soon as it and all groups before it are done, remuxed without re-encoding
+# into an MPEG-TS segment in stream_dir and appended to stream_dir/playlist.m3u8. The
+# playlist is an EVENT playlist, rewritten atomically after each segment and closed
+# with #EXT-X-ENDLIST at the end, so a player (ffplay, VLC, hls.js on a local server)
+# can start on the first group while the rest still renders. Segment timestamps
+# continue from the previous segment. target_duration must be at least the longest
+# group in seconds. `codec` is the script's encoder codec. The full video (and any
+# renditions, which are not streamed) is still joined into output_path at the end.
+# `groups` and `total` are as in render_in_parallel. If the render fails, the segments
+# published so far and the playlist are removed again, so no half stream is left.
+# Returns the total number of frames written.
+STREAM_PLAYLIST = "playlist.m3u8"
+
+# MPEG-4 Part 2 keeps its stream headers in the MP4 container; in MPEG-TS they have to
+# be in the stream itself, in front of every keyframe.
+STREAM_BITSTREAM_FILTERS = {"mpeg4": "dump_extra=freq=keyframe"}
+
+def write_playlist(stream_dir, entries, target_duration, finished=False):
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+        f"#EXT-X-TARGETDURATION:{math.ceil(target_duration)}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+    for name, seconds in entries:
+        lines += [f"#EXTINF:{seconds:.6f},", name]
+    if finished:
+        lines.append("#EXT-X-ENDLIST")
+    path = os.path.join(stream_dir, STREAM_PLAYLIST)
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+@metrics.timed("segment_publish")
+def publish_segment(segment_path, stream_path, start_seconds, codec='mp4v', ffmpeg_bin='ffmpeg'):
+    ffmpeg = require_ffmpeg(ffmpeg_bin)
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-i", os.path.abspath(segment_path), "-c", "copy"]
+    bitstream_filter = STREAM_BITSTREAM_FILTERS.get(FFMPEG_CODECS.get(codec, codec))
+    if bitstream_filter is not None:
+        cmd += ["-bsf:v", bitstream_filter]
+    cmd += ["-output_ts_offset", f"{start_seconds:.6f}", "-f", "mpegts", os.path.abspath(stream_path) + ".tmp"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg remux failed for {segment_path}: {result.stderr.strip()[-2000:]}")
+    os.replace(stream_path + ".tmp", stream_path)
+
+# Remove the stream files of a failed render (and stream_dir, if it was made for it)
+def remove_stream(stream_dir, entries, created=False):
+    names = [name for name, _ in entries] + [f"segment_{len(entries):05d}.ts", STREAM_PLAYLIST]
+    remove_files([os.path.join(stream_dir, name) + suffix for name in names for suffix in ("", ".tmp")])
+    if created:
+        try:
+            os.rmdir(stream_dir)
+        except OSError:
+            pass
+
+def render_progressive(render_segment, groups, output_path, stream_dir, fps, target_duration, workers, *extra_args,
+                       with_previous=False, renditions=(), codec='mp4v', total=None):
+    require_ffmpeg()
+    total = len(groups) if total is None else total
+    created = not os.path.isdir(stream_dir)
+    os.makedirs(stream_dir, exist_ok=True)
+    ext = os.path.splitext(output_path)[1]
+    segment_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    started = time.perf_counter()
+    entries = []
+    results = []
+    write_playlist(stream_dir, entries, target_duration)
+
+    def publish(path, frames):
+        name = f"segment_{len(entries):05d}.ts"
+        publish_segment(path, os.path.join(stream_dir, name), sum(seconds for _, seconds in entries), codec)
+        entries.append((name, frames / fps))
+        write_playlist(stream_dir, entries, target_duration)
+        if len(entries) == 1:
+            print(f"Stream: first segment playable after {time.perf_counter() - started:.2f}s")
+        results.append((path, frames))
+
+    def jobs():
+        previous = None
+        for idx, group in enumerate(groups):
+            yield ((os.path.join(segment_dir, f"segment_{idx:06d}{ext}"), [group], idx, total, *extra_args),
+                   previous_kwargs(previous, with_previous))
+            previous = group
+
+    segment_results = run_segments(render_segment, jobs(), workers)
+    try:
+        # Published in group order, each as soon as it (and every earlier group) is done
+        for path, frames in segment_results:
+            publish(path, frames)
+        write_playlist(stream_dir, entries, target_duration, finished=True)
+        concat_renditions([path for path, _ in results], output_path, renditions)
+        return sum(frames for _, frames in results)
+    except BaseException:
+        segment_results.close()
+        remove_stream(stream_dir, entries, created)
+        raise
+    finally:
+        segment_results.close()
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+# === Incremental re-render: each group's encoded segment is cached between runs ===
+# A group's key hashes its blocks, whether it is the first group (which has no
+# slide-in) and the script's timing and output settings. On the next run only groups
+# whose key changed are rendered; every other group is stream-copied from the cache.
+# Segments sit next to a ".frames" file with their frame count, written last, so a
+# half-written segment is never reused. A segment's rendition files are stored and
+# evicted with it. Least recently used segments are evicted once the directory passes
+# max_bytes.
+class SegmentCache:
+    def __init__(self, cache_dir, max_bytes=10 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key, ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def temp_path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}.{os.getpid()}.tmp{ext}")
+
+    # A segment cached without one of the requested renditions counts as missing
+    def get(self, key, ext, renditions=()):
+        path = self.path(key, ext)
+        try:
+            with open(path + ".frames") as f:
+                frames = int(f.read())
+            for height in renditions:
+                os.utime(rendition_path(path, height))
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return path, frames
+
+    def put(self, key, ext, segment_path, frames, renditions=()):
+        path = self.path(key, ext)
+        for height in renditions:
+            os.replace(rendition_path(segment_path, height), rendition_path(path, height))
+        os.replace(segment_path, path)
+        with open(path + ".frames", "w") as f:
+            f.write(str(frames))
+        return path
+
+    # keep: keys of segments that must stay (the ones the current output uses)
+    def evict(self, keep=()):
+        entries = {}
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and ".tmp" not in entry.name:
+                key = entry.name.split(".")[0].split("_")[0]
+                entries.setdefault(key, []).append(entry)
+        used = {
+            key: (max(entry.stat().st_mtime for entry in files), sum(entry.stat().st_size for entry in files))
+            for key, files in entries.items()
+        }
+        total = sum(size for _, size in used.values())
+        for key in sorted(used, key=lambda key: used[key][0]):
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            total -= used[key][1]
+            for entry in entries[key]:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+# With a transition that shows the outgoing group, the previous group's blocks are
+# part of the key as well.
+def segment_key(group, first, settings, previous=None):
+    digest = hashlib.sha256(repr((first, settings)).encode("utf-8"))
+    for block in list(group) + list(previous or ()):
+        digest.update(repr(block.shape).encode("utf-8"))
+        digest.update(block.tobytes())
+    return digest.hexdigest()
+
+# render_segment is called as in render_in_parallel, with one group per segment.
+# `settings` must cover everything besides the blocks that changes a group's frames.
+# Groups are keyed as they are taken from `groups` (any iterable, see render_in_parallel),
+# so only stale groups waiting for a worker are held in memory.
+def render_incremental(render_segment, groups, output_path, cache_dir, settings, workers, *extra_args,
+                       max_bytes=10 * 1024 ** 3, with_previous=False, renditions=(), total=None):
+    require_ffmpeg()
+    total = len(groups) if total is None else total
+    cache = SegmentCache(cache_dir, max_bytes)
+    ext = os.path.splitext(output_path)[1]
+    keys = []
+    segments = {}
+    stale = []
+    queued = set()
+
+    def jobs():
+        previous = None
+        for idx, group in enumerate(groups):
+            key = segment_key(group, idx == 0, (settings, extra_args), previous if with_previous else None)
+            keys.append(key)
+            if key not in segments and key not in queued:
+                cached = cache.get(key, ext, renditions)
+                if cached is None:
+                    stale.append(key)
+                    queued.add(key)
+                    yield (cache.temp_path(key, ext), [group], idx, total, *extra_args), previous_kwargs(previous, with_previous)
+                else:
+                    segments[key] = cached
+            previous = group
+
+    segment_results = run_segments(render_segment, jobs(), workers)
+    try:
+        # Results come back in job order, and a job's key is in `stale` once it is handed out
+        for n, (path, frames) in enumerate(segment_results):
+            segments[stale[n]] = (cache.put(stale[n], ext, path, frames, renditions), frames)
+    finally:
+        # Segments already stored stay in the cache for the next run; partial ones go
+        segment_results.close()
+        for key in stale:
+            path = cache.temp_path(key, ext)
+            remove_files([path] + [rendition_path(path, height) for height in renditions])
+
+    print(f"Segment cache: reused {len(keys) - len(stale)} of {len(keys)} groups, rendered {len(stale)}")
+    concat_renditions([segments[key][0] for key in keys], output_path, renditions)
+    cache.evict(keep=set(keys))
+    return sum(segments[key][1] for key in keys)
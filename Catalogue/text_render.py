@@ -0,0 +1,121 @@
+# Importing required packages
+import textwrap
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+from instrumentation import metrics
+
+# === Process-wide font registry ===
+# ImageFont.truetype() parses the font file on every call, so each (path, size)
+# is loaded once and shared by every caller in the process.
+fonts = {}
+
+def get_font(font_path, font_size):
+    key = (font_path, font_size)
+    font = fonts.get(key)
+    if font is None:
+        font = ImageFont.truetype(font_path, font_size)
+        fonts[key] = font
+    return font
+
+def font_key(font):
+    return (getattr(font, "path", id(font)), getattr(font, "size", None))
+
+# === Word widths, measured once per (font, word) ===
+MAX_CACHED_WORDS = 100_000
+word_widths = {}
+
+def text_width(font, text):
+    key = (font_key(font), text)
+    width = word_widths.get(key)
+    if width is None:
+        if len(word_widths) >= MAX_CACHED_WORDS:
+            word_widths.clear()
+        width = font.getlength(text)
+        word_widths[key] = width
+    return width
+
+# === Greedy word wrap to a pixel width, linear in the number of words ===
+# A line's width is the sum of its cached word widths plus the spaces between them,
+# so a growing line is never re-measured. A word wider than max_width gets a line
+# of its own instead of stalling the wrap.
+def wrap_text(text, font, max_width):
+    space = text_width(font, " ")
+    lines = []
+    line_words = []
+    line_width = 0
+    for word in text.split():
+        w = text_width(font, word)
+        if line_words and line_width + space + w > max_width:
+            lines.append(" ".join(line_words))
+            line_words, line_width = [], 0
+        line_width = w if not line_words else line_width + space + w
+        line_words.append(word)
+    if line_words:
+        lines.append(" ".join(line_words))
+    return lines
+
+# === LRU cache of finished, rasterized text blocks ===
+# Bounded by entry count and by total bytes, so a long catalogue with a distinct
+# description per item does not keep every panel it has drawn.
+class TextBlockCache:
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, render):
+        block = self._entries.get(key)
+        if block is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return block
+        self.misses += 1
+        block = render()
+        block.flags.writeable = False
+        self._entries[key] = block
+        self.nbytes += block.nbytes
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            self.nbytes -= self._entries.popitem(last=False)[1].nbytes
+        return block
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.nbytes, "hits": self.hits, "misses": self.misses}
+
+text_blocks = TextBlockCache()
+
+# === Description panel: wrapped, centered lines on a solid background ===
+# Lines are wrapped either to `wrap_chars` characters (textwrap) or to the panel's
+# pixel width. Lines are centered by their advance width ("advance") or by their
+# ink bounding box ("ink"). Without `height`, the panel grows to fit the lines with
+# `top` padding above and below. The returned array is shared and read-only.
+def text_block(text, font_path, font_size, width, line_height, top=0, height=None, max_lines=None,
+               wrap_chars=None, wrap_width=None, center_by="advance", fill=(255, 255, 255), bg=(0, 0, 0)):
+    key = (text, font_path, font_size, width, line_height, top, height, max_lines,
+           wrap_chars, wrap_width, center_by, fill, bg)
+
+    @metrics.timed("text_raster")
+    def render():
+        font = get_font(font_path, font_size)
+        if wrap_chars is not None:
+            lines = textwrap.wrap(text, width=wrap_chars)
+        else:
+            lines = wrap_text(text, font, wrap_width or width)
+        lines = lines[:max_lines]
+        panel_height = height if height is not None else len(lines) * line_height + 2 * top
+
+        pil_img = Image.fromarray(np.full((panel_height, width, 3), bg, dtype=np.uint8))
+        draw = ImageDraw.Draw(pil_img)
+        for i, line in enumerate(lines):
+            if center_by == "ink":
+                bbox = draw.textbbox((0, 0), line, font=font)
+                x = (width - (bbox[2] - bbox[0])) // 2
+            else:
+                x = (width - draw.textlength(line, font=font)) // 2
+            draw.text((x, top + i * line_height), line, font=font, fill=fill)
+        return np.array(pil_img)
+
+    return text_blocks.get(key, render)
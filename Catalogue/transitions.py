@@ -0,0 +1,131 @@
+# Importing required packages
+import cv2
+import numpy as np
+from instrumentation import metrics
+
+# === Transitions between consecutive groups ===
+# Each maps to whether it shows the outgoing group (its frame is then needed too):
+#   cut       - no entry animation
+#   slide     - the new group slides in from the right over an empty background
+#   push      - the new group slides in and pushes the previous one out to the left
+#   crossfade - the previous group fades into the new one
+#   wipe      - the new group is uncovered from left to right
+# Every transition frame is written into a caller-supplied buffer in about one pass
+# over the pixels, and is timed as its own stage (transition_<name>).
+TRANSITIONS = {"cut": False, "slide": False, "push": True, "crossfade": True, "wipe": True}
+
+def check_transition(name):
+    if name not in TRANSITIONS:
+        raise ValueError(f"Unknown transition '{name}'; expected one of: {', '.join(TRANSITIONS)}")
+    return name
+
+# === Paste a block at (x, y), clipped to the canvas edges ===
+# Blocks that are only partly on screen are cut instead of skipped.
+def blit_clipped(canvas, block, x, y):
+    canvas_h, canvas_w = canvas.shape[:2]
+    h, w = block.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, canvas_w), min(y + h, canvas_h)
+    if x1 <= x0 or y1 <= y0:
+        return
+    canvas[y0:y1, x0:x1] = block[y0 - y:y1 - y, x0 - x:x1 - x]
+
+# === Slide-in (and push) transition backed by a pre-composited strip ===
+# The incoming group is composited once (final_frame, i.e. make_frame at x_offset 0).
+# Solid background: the strip is [background | final_frame] side by side, and the
+# frame at x_offset is the window strip[:, W - x_offset : 2W - x_offset]. For a push
+# the previous group's frame takes the place of the background.
+# Textured background: the blocks slide over a static plate, so the same window of
+# the strip is copied onto the plate through a matching strip of the block mask
+# (empty on the left half for a slide).
+# Either way a frame costs one copy into `out` and no per-block work. Pass `strip`
+# (H x 2W) to build the strip in a reused buffer.
+class SlideStrip:
+    def __init__(self, final_frame, background, mask=None, strip=None, previous=None):
+        self.width = final_frame.shape[1]
+        self.background = background
+        self.stage = "transition_slide" if previous is None else "transition_push"
+        left = background if previous is None else previous
+        self.strip = np.concatenate([left, final_frame], axis=1, out=strip)
+        self.mask_strip = None if mask is None else mask_strip(mask, previous is not None)
+
+    def frame_at(self, x_offset, out=None):
+        x = min(max(x_offset, 0), self.width)
+        if out is None:
+            out = np.empty_like(self.background)
+        window = slice(self.width - x, 2 * self.width - x)
+        with metrics.stage(self.stage):
+            if self.mask_strip is None:
+                np.copyto(out, self.strip[:, window])
+            else:
+                np.copyto(out, self.background)
+                np.copyto(out, self.strip[:, window], where=self.mask_strip[:, window])
+        return out
+
+# [mask | mask] (push) or [empty | mask] (slide), per channel: a broadcast (h, w, 1)
+# mask is several times slower in copyto. Kept read-only per (mask, push).
+mask_strips = {}
+
+def mask_strip(mask, push):
+    key = (id(mask), push)
+    entry = mask_strips.get(key)
+    if entry is None:
+        left = mask if push else np.zeros_like(mask)
+        strip = np.repeat(np.concatenate([left, mask], axis=1)[:, :, None], 3, axis=2)
+        strip.flags.writeable = False
+        entry = (mask, strip)  # the mask is kept so its id stays unique
+        mask_strips[key] = entry
+    return entry[1]
+
+# === Crossfade: weighted sum of the two frames, written straight into `out` ===
+class Crossfade:
+    def __init__(self, previous, final_frame):
+        self.previous = previous
+        self.final_frame = final_frame
+
+    def frame_at(self, progress, out=None):
+        with metrics.stage("transition_crossfade"):
+            return cv2.addWeighted(self.previous, 1 - progress, self.final_frame, progress, 0, dst=out)
+
+# === Wipe: columns left of the edge come from the new frame, the rest from the old one ===
+class Wipe:
+    def __init__(self, previous, final_frame):
+        self.previous = previous
+        self.final_frame = final_frame
+        self.width = final_frame.shape[1]
+
+    def frame_at(self, progress, out=None):
+        x = min(max(int(progress * self.width), 0), self.width)
+        if out is None:
+            out = np.empty_like(self.final_frame)
+        with metrics.stage("transition_wipe"):
+            out[:, :x] = self.final_frame[:, :x]
+            out[:, x:] = self.previous[:, x:]
+        return out
+
+# === Entry animation of a group, one frame at a time ===
+# final_frame is the incoming group's composited frame and previous the outgoing
+# one's (only needed when TRANSITIONS[name] is true; None falls back to the
+# background). background is the empty plate and mask, for textured plates, the
+# pixels covered by block slots. Frames are written into buffers borrowed from
+# `pool` (a FramePool), so each one must be consumed before the ring wraps around.
+def transition_frames(name, final_frame, previous, background, n_frames, pool, mask=None):
+    if name == "cut":
+        return
+    if name in ("slide", "push"):
+        strip_buffer = pool.scratch("slide_strip", (final_frame.shape[0], 2 * final_frame.shape[1], 3))
+        if name == "push" and previous is None:
+            previous = background
+        transition = SlideStrip(final_frame, background, mask=mask, strip=strip_buffer,
+                                previous=previous if name == "push" else None)
+        for f in range(n_frames):
+            progress = f / n_frames
+            x_offset = int((1 - progress) * final_frame.shape[1])
+            yield transition.frame_at(x_offset, out=pool.borrow())
+        return
+
+    if previous is None:
+        previous = background
+    transition = Crossfade(previous, final_frame) if name == "crossfade" else Wipe(previous, final_frame)
+    for f in range(n_frames):
+        yield transition.frame_at(f / n_frames, out=pool.borrow())
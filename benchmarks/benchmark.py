@@ -0,0 +1,334 @@
+# Importing required packages
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+
+try:
+    import resource  # Peak RSS (not available on Windows)
+except ImportError:
+    resource = None
+
+# The renderers are flat scripts; make both folders importable
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "Catalogue"))
+sys.path.insert(0, os.path.join(REPO_DIR, "Bidding"))
+from instrumentation import metrics
+from pipeline import load_images
+from transitions import TRANSITIONS
+
+# === Benchmark suite for the Catalogue and Bidding renderers ===
+# Every case (script x catalogue size x source resolution) renders synthetic items:
+# generated JPEGs, sprites and descriptions, plus whichever TrueType font is found on
+# the host. Each case runs twice in fresh processes: once timing the individual stages
+# and once for the end-to-end encode, so caches start cold and peak RSS is per case.
+CATALOGUE_SCRIPTS = ("normal_video", "final_animate", "bgimage_background", "diff_size_image_video")
+SCRIPTS = CATALOGUE_SCRIPTS + ("bidding",)
+DEFAULT_SIZES = (8, 32)
+DEFAULT_RESOLUTIONS = ((1200, 1600), (3000, 4000))
+REDRAW_FRAMES = 30  # Frames timed per lot for the Bidding per-frame stages
+
+FONT_CANDIDATES = (
+    "C:/Windows/Fonts/arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+)
+
+WORDS = (
+    "antique", "silk", "saree", "handwoven", "vintage", "porcelain", "gold", "border", "zari",
+    "painted", "motif", "cotton", "heritage", "rare", "collector", "edition", "crafted", "blue",
+)
+
+def find_font(font_path=None):
+    for path in ((font_path,) if font_path else FONT_CANDIDATES):
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError("No TrueType font found; pass one with --font")
+
+# === Synthetic assets ===
+def synthetic_image(rng, width, height):
+    # Smooth gradient plus shapes and grain, so JPEG sizes and decode costs look like photos
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    color = rng.integers(0, 256, 3)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    for c in range(3):
+        img[:, :, c] = ((x * (c + 1) / 3 + y * (3 - c) / 3 + color[c]) % 256).astype(np.uint8)
+    for _ in range(12):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(min(width, height) // 20, min(width, height) // 4))
+        cv2.circle(img, center, radius, [int(v) for v in rng.integers(0, 256, 3)], -1)
+    noise = rng.integers(-12, 13, img.shape, dtype=np.int16)
+    return np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+def synthetic_sprite(hammer_down):
+    # Transparent 400x600 figure holding a gavel, raised or touching the block
+    sprite = np.zeros((600, 400, 4), dtype=np.uint8)
+    cv2.ellipse(sprite, (200, 380), (110, 200), 0, 0, 360, (60, 60, 160, 255), -1)
+    cv2.circle(sprite, (200, 130), 70, (150, 180, 220, 255), -1)
+    arm_end = (360, 420) if hammer_down else (350, 200)
+    cv2.line(sprite, (260, 300), arm_end, (60, 60, 160, 255), 30)
+    cv2.rectangle(sprite, (arm_end[0] - 30, arm_end[1] - 20), (arm_end[0] + 30, arm_end[1] + 20), (30, 60, 90, 255), -1)
+    return sprite
+
+# 2-12 words: normal_video only leaves room for about four lines under the bottom row
+def synthetic_descriptions(rng, n_items):
+    return [
+        " ".join(rng.choice(WORDS, int(rng.integers(2, 13)))).capitalize() + f" {i + 1}"
+        for i in range(n_items)
+    ]
+
+def make_assets(assets_dir, n_items, resolution):
+    width, height = resolution
+    folder = os.path.join(assets_dir, f"{width}x{height}")
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(width * 10007 + height)
+    for i in range(1, n_items + 1):
+        path = os.path.join(folder, f"{i}.jpg")
+        if not os.path.exists(path):
+            cv2.imwrite(path, synthetic_image(rng, width, height), [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+    shared = {
+        "background": os.path.join(assets_dir, "background.jpg"),
+        "human": os.path.join(assets_dir, "gavel_up.png"),
+        "hammer_down": os.path.join(assets_dir, "gavel_down.png"),
+    }
+    if not os.path.exists(shared["background"]):
+        cv2.imwrite(shared["background"], synthetic_image(np.random.default_rng(0), 1920, 1080))
+        cv2.imwrite(shared["human"], synthetic_sprite(hammer_down=False))
+        cv2.imwrite(shared["hammer_down"], synthetic_sprite(hammer_down=True))
+    return folder, shared
+
+# === Point a script at the synthetic assets ===
+def configure(script, case, out_dir):
+    module = importlib.import_module(script)
+    n_items = case["items"]
+    descriptions = synthetic_descriptions(np.random.default_rng(n_items), n_items)
+    module.font_path = case["font"]
+    if script == "bidding":
+        module.human_img_path = case["assets"]["human"]
+        module.hammer_down_img_path = case["assets"]["hammer_down"]
+        module.demo_data = [
+            {
+                "item_img": os.path.join(case["image_folder"], f"{i + 1}.jpg"),
+                "description": desc,
+                "price": f"₹{(i + 1) * 1500:,}",
+                "bidder": f"Bidder {i + 1}",
+            }
+            for i, desc in enumerate(descriptions)
+        ]
+        module.output_video = os.path.join(out_dir, "bidding.mp4")
+    else:
+        module.image_folder = case["image_folder"]
+        module.descriptions = descriptions
+        module.output_video = os.path.join(out_dir, script + os.path.splitext(module.output_video)[1])
+        if hasattr(module, "bg_image_path"):
+            module.bg_image_path = case["assets"]["background"]
+    return module
+
+def timed(stages, name, func, calls=1):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    stages[name] = {
+        "seconds": round(elapsed, 4),
+        "calls": calls,
+        "ms_per_call": round(1000 * elapsed / calls, 3) if calls else None,
+    }
+    return result
+
+def peak_rss_mb():
+    # Linux: VmHWM covers this process image only (ru_maxrss keeps the parent's peak across fork+exec)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+# === Stage timings ===
+def catalogue_stages(module):
+    stages = {}
+    n_items = len(module.descriptions)
+    images = timed(stages, "load_images", lambda: load_images(module), n_items)
+    blocks = timed(stages, "add_description", lambda: [
+        module.add_description(img, desc) for img, desc in zip(images, module.descriptions)
+    ], n_items)
+    groups = [blocks[i:i + 4] for i in range(0, len(blocks), 4)]
+
+    frame_args = ()
+    if hasattr(module, "compute_frame_size"):
+        sizes = [module.compute_frame_size(g) for g in groups]
+        frame_args = ((max(s[0] for s in sizes), max(s[1] for s in sizes)),)
+    timed(stages, "make_frame", lambda: [module.make_frame(g, *frame_args) for g in groups], len(groups))
+
+    # Every transition's entry animation for every group, from the group before it
+    default_transition = module.transition
+    for name in TRANSITIONS:
+        if name == "cut":
+            continue
+        module.transition = name
+        timed(stages, f"transition_{name}", lambda: sum(
+            1 for i, g in enumerate(groups)
+            for _ in module.transition_animation(g, *frame_args, previous_blocks=groups[i - 1] if i else None)
+        ), len(groups) * module.slide_frames)
+    module.transition = default_transition
+    return stages
+
+def bidding_stages(module):
+    stages = {}
+    timed(stages, "load_resources", module.load_resources)
+    lots = timed(stages, "create_static_layer", lambda: [
+        module.create_static_layer(item) for item in module.demo_data
+    ], len(module.demo_data))
+    timed(stages, "create_frame", lambda: [
+        module.create_frame(item, f) for item in module.demo_data for f in range(REDRAW_FRAMES)
+    ], len(module.demo_data) * REDRAW_FRAMES)
+
+    renderer = module.LayeredRenderer(module.WIDTH, module.HEIGHT)
+    def layered():
+        for layers in lots:
+            renderer.begin_lot(*layers)
+            for f in range(REDRAW_FRAMES):
+                renderer.render(module.gavel_sprite(f), module.GAVEL_POS)
+    timed(stages, "layered_render", layered, len(lots) * REDRAW_FRAMES)
+    return stages
+
+# === One case in a fresh process ===
+def run_case(case):
+    out_dir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        module = configure(case["script"], case, out_dir)
+        result = {}
+        if case["mode"] == "stages":
+            stages = bidding_stages(module) if case["script"] == "bidding" else catalogue_stages(module)
+            result["stages"] = stages
+            result["stages_peak_rss_mb"] = peak_rss_mb()
+        else:
+            metrics.reset()
+            start = time.perf_counter()
+            frames = module.generate_video()
+            elapsed = time.perf_counter() - start
+            summary = metrics.summary()
+            result.update({
+                "frames": frames,
+                "seconds": round(elapsed, 3),
+                "fps": round(frames / elapsed, 1) if elapsed > 0 else None,
+                "peak_rss_mb": peak_rss_mb(),
+                "bound_by": summary["bound_by"],
+                "encode_stages": summary["stages"],
+            })
+        return result
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def run_isolated(case):
+    # spawn, so every case starts from a fresh interpreter (cold caches, own peak RSS)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, case).result()
+
+def run_suite(scripts, sizes, resolutions, font, assets_dir):
+    results = []
+    for resolution in resolutions:
+        image_folder, assets = make_assets(assets_dir, max(sizes), resolution)
+        for script in scripts:
+            for n_items in sizes:
+                case = {"script": script, "items": n_items, "font": font,
+                        "image_folder": image_folder, "assets": assets}
+                print(f"{script}: {n_items} items, {resolution[0]}x{resolution[1]} sources...")
+                result = {"script": script, "items": n_items, "source_resolution": f"{resolution[0]}x{resolution[1]}"}
+                result.update(run_isolated(dict(case, mode="stages")))
+                result.update(run_isolated(dict(case, mode="encode")))
+                print(f"  {result['frames']} frames in {result['seconds']}s ({result['fps']} fps), "
+                      f"peak RSS {result['peak_rss_mb']} MB")
+                results.append(result)
+    return results
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+# === Compare against a saved run ===
+def case_id(result):
+    return (result["script"], result["items"], result["source_resolution"])
+
+def compare(results, baseline):
+    old = {case_id(r): r for r in baseline["results"]}
+    for result in results:
+        before = old.get(case_id(result))
+        if before is None or not before.get("fps"):
+            continue
+        change = 100 * (result["fps"] / before["fps"] - 1)
+        print(f"{result['script']:22} {result['items']:4} items {result['source_resolution']:>9}: "
+              f"{before['fps']:8.1f} -> {result['fps']:8.1f} fps ({change:+.1f}%)")
+        for name, stage in result["stages"].items():
+            old_stage = before.get("stages", {}).get(name)
+            if old_stage and old_stage["ms_per_call"]:
+                stage_change = 100 * (stage["ms_per_call"] / old_stage["ms_per_call"] - 1)
+                print(f"    {name:20} {old_stage['ms_per_call']:9.3f} -> {stage['ms_per_call']:9.3f} ms/call ({stage_change:+.1f}%)")
+
+def parse_resolution(value):
+    width, height = (int(v) for v in value.lower().split("x"))
+    return width, height
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Catalogue and Bidding renderers on synthetic catalogues.")
+    parser.add_argument("--scripts", default=",".join(SCRIPTS), help="Comma-separated scripts to run (default: all)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated catalogue sizes (items)")
+    parser.add_argument("--resolutions", default=",".join(f"{w}x{h}" for w, h in DEFAULT_RESOLUTIONS),
+                        help="Comma-separated source image resolutions, WIDTHxHEIGHT")
+    parser.add_argument("--font", help="TrueType font to render text with (default: first one found on this host)")
+    parser.add_argument("--assets-dir", help="Keep the synthetic assets here and reuse them (default: a temporary folder)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to save the results")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    scripts = args.scripts.split(",")
+    unknown = [s for s in scripts if s not in SCRIPTS]
+    if unknown:
+        parser.error(f"unknown script(s) {', '.join(unknown)}. Choose from: {', '.join(SCRIPTS)}")
+    sizes = [int(v) for v in args.sizes.split(",")]
+    resolutions = [parse_resolution(v) for v in args.resolutions.split(",")]
+
+    assets_dir = args.assets_dir or tempfile.mkdtemp(prefix="bench_assets_")
+    try:
+        results = run_suite(scripts, sizes, resolutions, find_font(args.font), assets_dir)
+    finally:
+        if not args.assets_dir:
+            shutil.rmtree(assets_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("Results saved to:", args.output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))